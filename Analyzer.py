@@ -0,0 +1,222 @@
+#-------------------------------------------------------------------------------
+# Name:        Analyzer
+# Purpose:     Offline analysis of the record files written by Recorder.py
+#              the records are loaded in numpy arrays and split in CAT commands
+#              command rates, query round trip times and the intervals where
+#              the radio didn't agree with the controller are computed on whole arrays
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 record analysis"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import sys
+import argparse
+from time import perf_counter
+try:
+    import numpy as np                      # only needed by this tool, pip install numpy
+except ImportError:
+    print("Analyzer.py needs numpy : pip install numpy")
+    sys.exit(1)
+from Recorder import MAGIC, HEADER, RECORD, DATASIZE, MIDI_IN, CAT_TX, CAT_RX, CONTINUED, ParseTime
+from KwdCat import READ_REQUEST
+
+## a record of the file, as Recorder.RECORD
+RECORD_DTYPE = np.dtype([('time','<f8'),('kind','u1'),('length','u1'),('data','S%d' % DATASIZE)])
+## one CAT command or answer : time, CAT_TX or CAT_RX, 2 letters code, first number after the code (-1 if none),
+## parameter length and offset of its first byte in the byte stream of its kind
+COMMAND_DTYPE = np.dtype([('time','<f8'),('kind','u1'),('code','S2'),('value','<i8'),('length','<i4'),('offset','<i8')])
+## reads which have a parameter, the others are the code alone
+READS = set(READ_REQUEST.values()) | {'SM0'}
+## IF answer : mode and receive VFO positions in the parameter
+IF_MODE = 27
+IF_VFO = 28
+MAXDIGITS = 11                              # FA/FB frequencies
+
+
+def LoadRecords(filename:str) -> np.ndarray:
+########################################
+# reads a ring file in one go, oldest record first
+# output : array of RECORD_DTYPE, empty if it isn't a record file
+########################################
+    with open(filename,'rb') as recfile:
+        magic, recsize, capacity, count = HEADER.unpack(recfile.read(HEADER.size))
+    if magic != MAGIC or recsize != RECORD.size or RECORD_DTYPE.itemsize != RECORD.size:
+        print(filename,"is not a midi2ts590 record file")
+        return np.zeros(0,RECORD_DTYPE)
+    records = np.fromfile(filename,RECORD_DTYPE,min(count,capacity),offset=HEADER.size)
+    if count > capacity:                    # the ring has wrapped, the oldest is the next to be written
+        start = count % capacity
+        records = np.concatenate((records[start:],records[:start]))
+    return records
+
+def SplitCommands(records:np.ndarray,kind:int) -> tuple:
+########################################
+# splits the data of the records of one kind in commands, without any loop on them
+# the data of these records are joined in one byte stream, so a command written
+# in several records or an answer read in several chunks is found whole
+# output : (commands as COMMAND_DTYPE, byte stream)
+########################################
+    chosen = records[(records['kind'] & (CONTINUED - 1)) == kind]
+    lengths = chosen['length'].astype(np.int64)
+    data = np.ascontiguousarray(chosen['data']).view(np.uint8).reshape(-1,DATASIZE)
+    stream = data[np.arange(DATASIZE) < lengths[:,None]]
+    if not len(stream):
+        return np.zeros(0,COMMAND_DTYPE), stream
+    times = np.repeat(chosen['time'],lengths)       # time of each byte
+    ends = np.flatnonzero(stream == ord(';'))
+    starts = np.concatenate(([0],ends[:-1] + 1))
+    keep = ends - starts >= 2                       # ;; or less than a code
+    starts, ends = starts[keep], ends[keep]
+
+    commands = np.zeros(len(starts),COMMAND_DTYPE)
+    commands['time'] = times[ends]                  # when it was complete, the end of an answer
+    commands['kind'] = kind
+    commands['code'] = (stream[starts].astype(np.uint16) | stream[starts + 1].astype(np.uint16) << 8).view('S2')
+    commands['length'] = ends - starts - 2
+    commands['offset'] = starts + 2
+    # first number of the parameter, digit after digit for all the commands together
+    value = np.zeros(len(starts),np.int64)
+    going = np.ones(len(starts),bool)
+    for digit in range(MAXDIGITS):
+        position = np.minimum(starts + 2 + digit,len(stream) - 1)
+        byte = stream[position].astype(np.int64) - ord('0')
+        going &= (commands['length'] > digit) & (byte >= 0) & (byte <= 9)
+        value = np.where(going,value * 10 + byte,value)
+    commands['value'] = np.where(commands['length'] > 0,value,-1)
+    if DEBUG:
+        print("%d %s commands" % (len(commands),'CAT>' if kind == CAT_TX else 'CAT<'))
+    return commands, stream
+
+def CommandRates(commands:np.ndarray,code:str) -> np.ndarray:
+########################################
+# commands of code per second, each second from the first to the last of the commands
+########################################
+    times = commands['time'][commands['code'] == code.encode()]
+    if not len(times):
+        return np.zeros(0,np.int64)
+    first = np.floor(times[0])
+    return np.bincount((times - first).astype(np.int64))
+
+def QueryTimes(sent:np.ndarray,txstream:np.ndarray,answers:np.ndarray,maxtime=1.0) -> dict:
+########################################
+# round trip times of the reads : from the read written to the end of its answer
+# a read gets the first answer with its code after it, if it comes before the next read
+# with the same code and within maxtime s. The answers to other programs (sniffing) are left out
+# output : {code:array of times in s}
+########################################
+    lengths = sent['length']
+    reads = lengths == 0
+    three = np.flatnonzero(lengths == 1)            # SM0, AG0...
+    if len(three):
+        whole = np.char.add(sent['code'][three],txstream[sent['offset'][three]].view('S1'))
+        reads[three[np.isin(whole,[read.encode() for read in READS])]] = True
+    reads = sent[reads]
+    times = {}
+    for code in np.unique(reads['code']):
+        asked = reads['time'][reads['code'] == code]
+        answered = answers['time'][answers['code'] == code]
+        if not len(answered):
+            continue
+        index = np.searchsorted(answered,asked)
+        found = index < len(answered)
+        answer = answered[np.minimum(index,len(answered) - 1)]
+        nextread = np.append(asked[1:],np.inf)
+        rtt = answer - asked
+        matched = found & (answer <= nextread) & (rtt <= maxtime)
+        if matched.any():
+            times[code.decode()] = rtt[matched]
+    return times
+
+def Divergences(sent:np.ndarray,answers:np.ndarray,rxstream:np.ndarray,code:str,position:int) -> np.ndarray:
+########################################
+# intervals where the radio, as read in the IF answers, didn't have what the controller set last
+# code : set command of the controller, MD (mode) or FR (receive VFO), its value compared
+#        with the digit at position in the IF parameter
+# output : array of (start,end) times in s, end is the first IF agreeing again
+########################################
+    sets = sent[(sent['code'] == code.encode()) & (sent['length'] == 1)]
+    polls = answers[(answers['code'] == b'IF') & (answers['length'] > position)]
+    if not len(sets) or not len(polls):
+        return np.zeros((0,2))
+    last = np.searchsorted(sets['time'],polls['time']) - 1           # last set before each IF
+    known = last >= 0
+    polls, last = polls[known], last[known]
+    radio = rxstream[polls['offset'] + position].astype(np.int64) - ord('0')
+    differ = radio != sets['value'][last]
+    # starts where the radio begins to differ, ends where it agrees again
+    change = np.diff(np.concatenate(([0],differ.astype(np.int8),[0])))
+    starts = np.flatnonzero(change == 1)
+    ends = np.flatnonzero(change == -1)
+    endtimes = np.append(polls['time'],polls['time'][-1])[ends]       # still differing at the end of the file
+    return np.column_stack((polls['time'][starts],endtimes))
+
+def Report(records:np.ndarray,code='UD'):
+# prints the analysis of the records
+    midi = np.count_nonzero(records['kind'] == MIDI_IN)
+    sent, txstream = SplitCommands(records,CAT_TX)
+    answers, rxstream = SplitCommands(records,CAT_RX)
+    span = records['time'][-1] - records['time'][0]
+    print("%d records, %.0f s, %d MIDI events, %d CAT commands, %d CAT answers" % (len(records),span,midi,len(sent),len(answers)))
+
+    rates = CommandRates(sent,code)
+    if len(rates):
+        busy = rates[rates > 0]
+        print("\n%s commands : %d, per second %.1f on average, %.1f while tuning, %d at most, 95%% of the seconds under %.0f" %
+              (code,rates.sum(),rates.mean(),busy.mean(),rates.max(),np.percentile(rates,95)))
+    else:
+        print("\nno %s command" % code)
+
+    times = QueryTimes(sent,txstream,answers)
+    if times:
+        print("\nQuery round trip times in ms          p50      p90      p99    p99.9      max")
+        for name,rtt in sorted(times.items(),key=lambda item: -len(item[1])) + [('all',np.concatenate(list(times.values())))]:
+            print("  %-4s %8d queries  " % (name,len(rtt)) +
+                  ' '.join('%8.1f' % value for value in np.percentile(rtt,[50,90,99,99.9]) * 1000) + '%9.1f' % (rtt.max() * 1000))
+    else:
+        print("\nno query answered")
+
+    print("\nRadio not as set by the controller, from the IF answers :")
+    for name,setcode,position in (('mode','MD',IF_MODE),('VFO','FR',IF_VFO)):
+        intervals = Divergences(sent,answers,rxstream,setcode,position)
+        durations = intervals[:,1] - intervals[:,0]
+        if len(intervals):
+            print("  %-5s %d times, %.1f s in all, %.2f s median, %.1f s longest" %
+                  (name,len(intervals),durations.sum(),np.median(durations),durations.max()))
+        else:
+            print("  %-5s never" % name)
+
+
+if __name__ == "__main__":
+    print ("%s" %(__Title))
+    print ("Version %s, date : %s\n" % (__Version, __VersionDate))
+
+    parser = argparse.ArgumentParser(description="command rates, query times and radio/controller divergences of a midi2ts590 record file")
+    parser.add_argument("file", nargs='?', default='midi2ts590.rec', help="record file")
+    parser.add_argument("--start", help="start of window, YYYY-MM-DD HH:MM:SS or seconds since epoch")
+    parser.add_argument("--end", help="end of window, same format")
+    parser.add_argument("--last", type=float, help="only the last LAST seconds of the file")
+    parser.add_argument("--code", default='UD', help="CAT command counted per second, UD (VFO steps) by default")
+    args = parser.parse_args()
+
+    stamp = perf_counter()
+    records = LoadRecords(args.file)
+    if len(records):
+        start = ParseTime(args.start) if args.start else records['time'][0]
+        end = ParseTime(args.end) if args.end else records['time'][-1]
+        if args.last:
+            start = max(start,records['time'][-1] - args.last)
+        records = records[(records['time'] >= start) & (records['time'] <= end)]
+    if len(records):
+        Report(records,args.code.upper())
+    else:
+        print("no record")
+    print("\nanalysed in %.2f s" % (perf_counter() - stamp))
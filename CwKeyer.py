@@ -0,0 +1,189 @@
+#-------------------------------------------------------------------------------
+# Name:        CwKeyer
+# Purpose:     CW macros sent with the KY command of the radio keyer
+#              the text goes in chunks of 24 characters, the next chunk is sent
+#              while the radio still has CW to send, when its buffer has room
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 CW keyer"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import threading
+import configparser
+from time import sleep, perf_counter
+from Metrics import metrics
+
+## max characters in one KY command
+CHUNK = 24
+## CW kept ahead in the radio buffer, in dit units, about 8 characters
+LEAD = 80
+## time between two KY reads while the radio buffer is full, in s
+FULL_RETRY = 0.02
+
+## morse code, only the characters the radio keyer sends
+MORSE = {
+    'A':'.-','B':'-...','C':'-.-.','D':'-..','E':'.','F':'..-.','G':'--.','H':'....','I':'..','J':'.---',
+    'K':'-.-','L':'.-..','M':'--','N':'-.','O':'---','P':'.--.','Q':'--.-','R':'.-.','S':'...','T':'-',
+    'U':'..-','V':'...-','W':'.--','X':'-..-','Y':'-.--','Z':'--..',
+    '0':'-----','1':'.----','2':'..---','3':'...--','4':'....-','5':'.....','6':'-....','7':'--...',
+    '8':'---..','9':'----.','/':'-..-.','?':'..--..','.':'.-.-.-',',':'--..--','=':'-...-','+':'.-.-.',
+    '-':'-....-','(':'-.--.',')':'-.--.-',':':'---...',"'":'.----.','"':'.-..-.','@':'.--.-.',
+}
+
+def MorseUnits(text:str) -> int:
+########################################
+# length of text in dit units, with the gaps after each character
+# dit 1, dah 3, 1 between elements, 3 between characters, 7 between words
+########################################
+    units = 0
+    for char in text:
+        code = MORSE.get(char)
+        if char == ' ':
+            units += 4                          # the 3 after the previous character make 7
+        elif code:
+            units += code.count('.') + 3 * code.count('-') + len(code) - 1 + 3
+    return units
+
+
+class CwKeyer(object):
+    """
+    class sending CW macros through the radio keyer
+    """
+    def __init__(self,radio,macros:dict,wpm=25,serial=1,abort='RX',serialfile=None):
+        # radio : an opened KwdCat
+        # macros : {name:text}, # in the text is replaced by the serial number
+        # wpm : keyer speed set on the radio before sending, 0 to keep the radio one
+        # serial : first serial number
+        # abort : command(s) stopping the radio keyer
+        # serialfile : ini like file keeping the next serial number between runs, None to start at serial each time
+        self.radio = radio
+        self.macros = {name.lower():text.upper() for name,text in macros.items()}
+        self.wpm = wpm
+        self.start_serial = serial
+        self.serialfile = serialfile
+        self.serial = self.load_serial()
+        self.abort_cmd = abort
+        self.running = False
+        self.thread = None
+
+    def expand(self,name:str) -> str:
+        ########################################
+        # text of a macro, with the serial number in place of #
+        # the serial number goes up each time it has been used
+        ########################################
+        text = self.macros.get(name.lower())
+        if text is None:
+            print("CW macro",name,"not found in [CW]")
+            return ''
+        if '#' in text:
+            text = text.replace('#','%03d' % self.serial)
+            self.serial += 1
+            self.save_serial()
+        return text
+
+    def load_serial(self) -> int:
+        ########################################
+        # next serial number saved by the last run
+        # the first one again if the serial of the ini file has been changed, e.g for a new contest
+        ########################################
+        if not self.serialfile:
+            return self.start_serial
+        saved = configparser.ConfigParser()
+        saved.read(self.serialfile)
+        if saved.getint('CW','start',fallback=None) != self.start_serial:
+            return self.start_serial
+        return saved.getint('CW','serial',fallback=self.start_serial)
+
+    def save_serial(self):
+        # saved as soon as it has been used, the other sections of the file are kept
+        if not self.serialfile:
+            return
+        saved = configparser.ConfigParser()
+        saved.optionxform = str
+        saved.read(self.serialfile)
+        saved['CW'] = {'start':self.start_serial, 'serial':self.serial}
+        try:
+            with open(self.serialfile,'w') as serfile:
+                saved.write(serfile)
+        except OSError as msg:
+            print("CW serial number not saved :",msg)
+
+    def play(self,name:str) -> bool:
+        # sends a macro, returns True if sending
+        text = self.expand(name)
+        if not text or self.running:
+            return False
+        self.running = True
+        self.thread = threading.Thread(target=self.run, args=(text,), daemon=True, name='CW keyer')
+        self.thread.start()
+        return True
+
+    def abort(self):
+        self.running = False
+        self.radio.query(self.abort_cmd,0)
+        metrics.inc('cw_aborts')
+        print("CW aborted")
+
+    def buffer_free(self) -> bool:
+        # KY read : KY0 the radio buffer has room, KY1 it is full
+        # pipelined, the port isn't held while waiting for the answer, no answer counts as full
+        answers = self.radio.pipeline(['KY'],timeout=0.05,wait=True) or {}
+        return answers.get('KY') == 'KY0'
+
+    def run(self,text:str):
+        ########################################
+        # sends the text chunk by chunk
+        # the radio is expected to be busy until 'ahead', from the CW already given to it
+        # the next chunk is given LEAD units before, so there is no gap between chunks,
+        # if the radio says its buffer has room, else it is asked again a bit later
+        ########################################
+        wpm = self.wpm
+        if wpm:
+            self.radio.query('KS%03d' % wpm,0)
+        else:
+            answer = self.radio.query('KS',5)
+            wpm = int(answer[2:5]) if answer else 25
+        unit = 1.2 / wpm                                # dit length in s, PARIS
+        chunks = [text[i:i + CHUNK] for i in range(0,len(text),CHUNK)]
+        start = perf_counter()
+        ahead = start
+        fulls = 0
+        for chunk in chunks:
+            while self.running:
+                delay = ahead - LEAD * unit - perf_counter()
+                if delay > 0:
+                    sleep(min(delay,0.1))               # short sleeps to abort quickly
+                    continue
+                if self.buffer_free():
+                    break
+                fulls += 1
+                metrics.inc('cw_buffer_full')
+                sleep(FULL_RETRY)
+            if not self.running:
+                return
+            self.radio.send('KY ' + chunk + ';')        # send() keeps the trailing spaces
+            metrics.inc('cw_chunks')
+            ahead = max(ahead,perf_counter()) + MorseUnits(chunk) * unit
+            if DEBUG:
+                print("CW chunk '%s', %.2f s ahead" % (chunk,ahead - perf_counter()))
+        while self.running and perf_counter() < ahead:  # until the last character is sent
+            sleep(0.05)
+        if self.running:
+            self.running = False
+            elapsed = perf_counter() - start
+            print("CW sent : %s  (%.1f s, %d chunks, buffer full %d times)" % (text,elapsed,len(chunks),fulls))
+
+
+if __name__ == "__main__":
+  print ("%s" %(__Title))
+  print ("Version %s, date : %s" % (__Version, __VersionDate))
+  print ("This is a library, to be called from other modules. It does nothing by itself.")
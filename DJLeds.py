@@ -0,0 +1,195 @@
+#-------------------------------------------------------------------------------
+# Name:        DJLeds
+# Purpose:     A frame based LED engine for the DJ controller
+#              LED states and effects (blink, pulse) are composed on each frame
+#              and only the changes are sent, in a single MIDI write per frame
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "DJ controller LED engine"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import threading
+from time import sleep, perf_counter
+from Metrics import metrics
+
+## all the LEDs of the DJcontrol compact
+ALL_LEDS = (1,2,3,4,33,34,35,49,50,51,52,81,82,83,43,45,48)
+
+class DJLeds(object):
+    """
+    class to handle the LEDs of the DJ controller without ever blocking the caller
+    """
+    def __init__(self,output,rate=25):
+        # output : an opened pygame.midi.Output
+        # rate : number of frames per second
+        self.output = output
+        self.rate = rate
+        self.lock = threading.Lock()
+        self.base = {}          # {led:value} the steady state wanted for each LED
+        self.effects = {}       # {led:(period,duty,start,count)} running animations
+        self.shadow = {}        # {led:value} what has been sent to the controller
+        self.sent = 0           # number of MIDI messages sent
+        self.running = False
+        self.lost = False       # the output failed, it must be opened again, see set_output()
+        self.output_lock = threading.Lock()     # the output isn't changed while a frame is written
+
+    def set(self,led:int,state:int):
+        ########################################
+        # sets a LED ON (state != 0) or OFF
+        # stops any effect running on this LED
+        ########################################
+        self.set_many({led:state})
+
+    def set_many(self,states:dict):
+        ########################################
+        # sets several LEDs at once
+        # input : dict {led:state}
+        ########################################
+        with self.lock:
+            for led,state in states.items():
+                self.base[led] = 127 if state else 0
+                self.effects.pop(led,None)
+
+    def blink(self,led:int,period:float,count=0,duty=0.5):
+        ########################################
+        # blinks a LED, starting ON
+        # input : period in s, count number of blinks, 0 = until stopped
+        #         duty: part of the period the LED is ON
+        # a LED already blinking the same way keeps its phase
+        ########################################
+        with self.lock:
+            effect = self.effects.get(led)
+            if effect is None or effect[0:2] != (period,duty) or effect[3] != count:
+                self.effects[led] = (period,duty,perf_counter(),count)
+
+    def pulse(self,led:int,period=1.0):
+        ########################################
+        # short flash once per period, for steady indicators like split
+        ########################################
+        self.blink(led,period,0,0.15)
+
+    def stop(self,led:int):
+        ########################################
+        # stops the effect on a LED, back to its steady state
+        ########################################
+        with self.lock:
+            self.effects.pop(led,None)
+
+    def wait(self,timeout=5.0) -> bool:
+        ########################################
+        # waits until the effects with a count are finished, e.g the startup animation
+        # a set() would stop them, so this comes before the LEDs follow the radio
+        # returns False after timeout s, e.g if the engine isn't running
+        ########################################
+        end = perf_counter() + timeout
+        while perf_counter() < end:
+            with self.lock:
+                if not any(count for period,duty,start,count in self.effects.values()):
+                    return True
+            sleep(1 / self.rate)
+        return False
+
+    def resync(self):
+        ########################################
+        # forget what was sent, so the next frame sends all LEDs states
+        # e.g after the controller has been reconnected
+        ########################################
+        with self.lock:
+            self.shadow.clear()
+
+    def set_output(self,output):
+        ########################################
+        # changes the MIDI output, e.g the controller has been unplugged and plugged again
+        # None stops the writes until a new output is given, the LEDs states keep being composed
+        # the next frame sends all the LEDs states in one write
+        ########################################
+        with self.output_lock:
+            self.output = output
+            self.lost = False
+            self.resync()
+
+    def frame(self,now:float):
+        ########################################
+        # composes the LEDs states at time now
+        # and sends the changes in a single MIDI write
+        # if the write fails, the output is dropped and lost is set, nothing more is written
+        ########################################
+        with self.output_lock:
+            if self.output is None:
+                return
+            messages = self.compose(now)
+            if not messages:
+                return
+            try:
+                self.output.write(messages)
+            except Exception as msg:
+                self.output = None
+                self.lost = True
+                self.resync()
+                print("\nMIDI output error :",msg)
+                return
+        self.sent += len(messages)
+        metrics.inc('led_messages',len(messages))
+        if DEBUG:
+            print("LEDs frame :",messages)
+
+    def compose(self,now:float) -> list:
+        ########################################
+        # the LEDs states at time now, the shadow is updated as if they were sent
+        # output : the MIDI messages of the LEDs which change
+        ########################################
+        with self.lock:
+            states = dict(self.base)
+            for led,(period,duty,start,count) in list(self.effects.items()):
+                elapsed = now - start
+                if count and elapsed >= count * period:      # effect finished
+                    del self.effects[led]
+                    states.setdefault(led,0)                # back to its steady state, OFF if none
+                    continue
+                states[led] = 127 if (elapsed % period) < period * duty else 0
+            messages = [ [[144,led,value],0] for led,value in states.items() if self.shadow.get(led) != value ]
+            self.shadow.update(states)
+        return messages
+
+    def run(self):
+        # the engine loop, one frame every 1/rate s
+        period = 1 / self.rate
+        nexttime = perf_counter()
+        while self.running:
+            try:
+                self.frame(perf_counter())
+            except Exception as msg:
+                print("Exception in DJLeds frame :",msg)
+            nexttime += period
+            delay = nexttime - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            else:
+                nexttime = perf_counter()           # late, don't try to catch up
+
+    def start(self):
+        # starts the engine in its own thread
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True, name='DJ Leds')
+        self.thread.start()
+
+    def stop_engine(self):
+        # stops the engine after a last frame
+        self.running = False
+        self.thread.join()
+        self.frame(perf_counter())
+
+
+if __name__ == "__main__":
+  print ("%s" %(__Title))
+  print ("Version %s, date : %s" % (__Version, __VersionDate))
+  print ("This is a library, to be called from other modules. It does nothing by itself.")
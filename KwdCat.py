@@ -10,8 +10,8 @@
 #-------------------------------------------------------------------------------
 
 __Title = "Python Kenwood CAT library"
-__Version = "0.2"
-__VersionDate = "27/01/2023"
+__Version = "0.5"
+__VersionDate = "19/10/2026"
 
 
 ## flag to be a bit verbose
@@ -20,15 +20,72 @@ DEBUG = False
 ## Imports
 import re
 import sys
+import threading
+from collections import deque
+from Recorder import CAT_TX, CAT_RX
+from Metrics import metrics
 import serial
 from serial import SerialException
 from serial.tools.list_ports import comports
-from time import sleep
+from time import sleep, perf_counter
+
+## what to do with a command issued while the COM port is lost
+## 'drop'   : forget it, it makes no sense later (relative moves, keying, clears)
+## 'last'   : only the last value counts, it is restored with the radio settings
+## 'replay' : keep it and send it again once the port is back
+## commands not listed here are replayed
+REPLAY_POLICY = {
+    'UD':'drop', 'UP':'drop', 'DN':'drop', 'RU':'drop', 'RD':'drop', 'RC':'drop',
+    'TX':'drop', 'RX':'drop', 'KY':'drop', 'CA':'drop', 'TS':'drop',
+    'PS':'last', 'MD':'last', 'FR':'last', 'FT':'last', 'AG':'last', 'RG':'last',
+    'PC':'last', 'SH':'last', 'SL':'last', 'FW':'last', 'IS':'last', 'RT':'last',
+    'XT':'last', 'FA':'last', 'FB':'last',
+}
+## radio settings restored after a reconnection, in this order
+RESTORE_ORDER = ('PS','MD','FA','FB','FR','FT','AG','RG','PC','SH','SL','FW','IS','RT','XT')
+## commands moving the VFO frequencies, the last FA/FB sent are then out of date
+FREQ_MOVES = {'UD0':('FA',), 'UD1':('FB',), 'UP':('FA','FB'), 'DN':('FA','FB'), 'VV':('FB',)}
+## reads needing a parameter, the others are read with the 2 letters of the command
+READ_REQUEST = {'AG':'AG0'}
+## pacing probe : a read with a short answer, sent in bursts to measure the radio time per command
+PROBE = 'PS'
 
 class KwdCat(object):
     """
     class to handle Kenwood remote control protocol
     """
+    def __init__(self):
+        self.lock = threading.RLock()       # serializes the COM port accesses between threads
+        self.connected = False              # False until open_port succeeded, or when the port is lost
+        self.settings = {}                  # last value sent for each command of RESTORE_ORDER
+        self.pending = deque(maxlen=50)     # commands to replay once the port is back
+        self.lost_time = None               # perf_counter() when the port was lost
+        self.reopen_time = None             # perf_counter() when the lost port could be opened again
+        self.outage_time = None             # duration of the last outage in s, from the loss to the restore
+        self.recovery_time = None           # duration of the last recovery in s, from the reopen to the restore
+        self.reconnects = 0                 # number of successful reconnections
+        self.waiting = deque()              # one item per control command waiting for the port, low priority traffic gives way
+        self.recorder = None                # a Recorder capturing the CAT traffic, if any
+        self.collecting = 0                 # pipelines waiting for their answers, read() gives way
+        self.unclaimed = ''                 # frames read by a pipeline which aren't its answers, for read()
+        self.latest = {}                    # continuous controls waiting for the writer {key:[command,count,stamp,relative]}
+        self.queued = threading.Condition()
+        self.writing = False                # True while the writer thread runs
+        self.maxlag = 0.3                   # relative moves older than this are shed, in s
+        self.flushing = False               # True while the posted commands are written, port lock held
+        self.pacing = False                 # True once set_pacing() has been called
+        self.link_rate = 0.0                # bytes per s on the line
+        self.command_cost = 0.0             # radio time per command in s
+        self.burst = 4                      # commands the radio takes back to back
+        self.tokens = 0.0                   # radio time available in s, negative when the radio is still busy
+        self.token_time = 0.0               # perf_counter() of the last tokens update
+        self.paced = 0                      # writes which had to wait
+        self.sent_bytes = 0                 # bytes and commands written, for the throughput
+        self.sent_commands = 0
+        self.second = 0                     # current second and commands written in it
+        self.second_commands = 0
+        self.peak = 0                       # most commands written in one second
+
     def find_ports(self):
         # show a list of current COM ports
         sys.stderr.write('\nBEWARE, some virtual ports may not be shown !\n')
@@ -55,8 +112,13 @@ class KwdCat(object):
         self.txtimeout = txtimeout
 
         # define the serial port for radio
+        print("\nOpening COM port...")
+        return self.reopen_port(verbose=True)
+
+    def reopen_port(self,verbose=False) -> bool:
+        # (re)opens the COM port with the values given to open_port
+        # used at start and by the supervisor after the port has been lost
         try:
-            print("\nOpening COM port...")
             self.serial = serial.Serial(        # set the port parameters
             port = self.port,
             baudrate = self.baudrate,
@@ -74,15 +136,20 @@ class KwdCat(object):
             self.serial.rts = self.rts          # put RTS line HIGH
 
             self.serial.is_open                 # open COM port
+            self.connected = True
+            if self.lost_time is not None:
+                self.reopen_time = perf_counter()
             return True
-        except SerialException as msg:                 # if COM port communication problem
-            print("Exception in open_port",msg)
+        except (SerialException, OSError) as msg:      # if COM port communication problem
+            if verbose:
+                print("Exception in open_port",msg)
             return False
 
     def close_port(self) -> bool:
         #################################
         # Close the comport
         #################################
+        self.connected = False
         try:
             self.serial.close()
         except AttributeError:
@@ -92,27 +159,346 @@ class KwdCat(object):
             print("Closing the COM port...")
             return True
 
-    def send(self,datastosend:str):
+    def set_line(self,line:str,state:bool) -> bool:
+        #################################
+        # sets the RTS or DTR line at once, e.g to key the radio
+        # the port lock isn't taken, the line doesn't wait for the CAT commands
+        # the line goes back to its open_port level when the port is opened again
+        #################################
+        if not self.connected:
+            return False
+        try:
+            setattr(self.serial,line,bool(state))
+            return True
+        except (SerialException, OSError) as msg:
+            self.port_lost(msg)
+            return False
+
+    def port_lost(self,msg):
+        #################################
+        # called on a COM port error
+        # flags the port as lost for the supervisor and closes it
+        #################################
+        with self.lock:
+            if not self.connected:
+                return
+            self.connected = False
+            self.lost_time = perf_counter()
+            metrics.inc('port_lost')
+            print("COM port lost :",msg)
+            try:
+                self.serial.close()
+            except (SerialException, OSError):
+                pass
+
+    def port_alive(self) -> bool:
+        #################################
+        # check the COM port is still there, even if nothing is sent
+        # some drivers only report an unplugged port when it is accessed
+        #################################
+        with self.lock:
+            if not self.connected:
+                return False
+            try:
+                self.serial.in_waiting
+                return True
+            except (SerialException, OSError) as msg:
+                self.port_lost(msg)
+                return False
+
+    def track(self,request:str,replay=True):
+        ########################################
+        # remember the settings sent to the radio, and when the port is lost
+        # keep the commands to replay according to REPLAY_POLICY
+        # request can hold several commands separated by ;
+        # replay False for a read, its answer would be lost anyway
+        ########################################
+        for cmd in request.split(';'):
+            cmd = cmd.strip()
+            prefix = cmd[:2].upper()
+            if len(cmd) > 2 and prefix in RESTORE_ORDER:       # a set command, not a read
+                self.settings[prefix] = cmd
+            for moved in FREQ_MOVES.get(cmd[:3].upper(),FREQ_MOVES.get(prefix,())):
+                self.settings.pop(moved,None)                   # not restored, the radio knows better
+            if not self.connected and cmd and replay:
+                if REPLAY_POLICY.get(prefix,'replay') == 'replay':
+                    self.pending.append(cmd)
+                elif DEBUG:
+                    print("Port lost, command not replayed :",cmd)
+
+    def restore_state(self) -> float:
+        ########################################
+        # after a reconnection, sends back the last known settings
+        # and the commands waiting to be replayed, in one single write
+        # to be called once the radio answers on the reopened port
+        # returns the recovery time in s since the port was reopened,
+        # the whole outage since the port was lost is in outage_time
+        ########################################
+        with self.lock:
+            cmds = [self.settings[prefix] for prefix in RESTORE_ORDER if prefix in self.settings]
+            cmds += list(self.pending)
+            self.pending.clear()
+            if cmds:
+                self.send(';'.join(cmds) + ';')
+            now = perf_counter()
+            if self.lost_time is not None:
+                self.outage_time = now - self.lost_time
+                self.recovery_time = now - (self.reopen_time or now)
+                metrics.observe('recovery_time',self.recovery_time)
+                self.lost_time = None
+                self.reopen_time = None
+            self.reconnects += 1
+            return self.recovery_time
+
+    def set_pacing(self,cost:float,burst=4):
+        ########################################
+        # spaces the writes out so the radio is never given more than it can take
+        # token bucket of radio time : a write costs the longest of its time on the line
+        # and cost s for each of its commands, the bucket holds burst commands
+        # cost : radio time per command in s, see calibrate()
+        ########################################
+        bits = 1 + self.bytesize + (self.parity != 'N') + self.stopbits     # start, data, parity, stop bits
+        self.link_rate = self.baudrate / bits
+        self.command_cost = cost
+        self.burst = burst
+        self.tokens = self.capacity()
+        self.token_time = perf_counter()
+        self.pacing = True
+
+    def capacity(self) -> float:
+        # radio time the bucket holds : burst commands of 7 bytes (UD0005;)
+        return self.burst * max(self.command_cost,7 / self.link_rate)
+
+    def pace(self,data:bytes):
+        ########################################
+        # waits until the radio has had time for what was written before, then takes the cost of data
+        # called with the port lock held, just before the write, so nothing overtakes a paced write
+        # a write is never split, a long one (macro) makes the next ones wait
+        ########################################
+        commands = data.count(b';')
+        now = perf_counter()
+        if self.pacing:
+            self.tokens = min(self.capacity(),self.tokens + now - self.token_time)
+            if self.tokens < 0:                                 # still busy with the last writes
+                sleep(-self.tokens)
+                metrics.observe('pacing_wait',-self.tokens)
+                self.paced += 1
+                now = perf_counter()
+                self.tokens = 0.0
+            self.token_time = now
+            self.tokens -= max(len(data) / self.link_rate,commands * self.command_cost)
+        self.sent_bytes += len(data)
+        self.sent_commands += commands
+        if int(now) != self.second:                             # commands per second, the peak kept
+            self.second = int(now)
+            self.second_commands = 0
+        self.second_commands += commands
+        self.peak = max(self.peak,self.second_commands)
+
+    def calibrate(self,count=20) -> float:
+        ########################################
+        # measures the radio time per command with a probe burst
+        # count PS reads in one write : the time until the last answer, less the time of
+        # one read alone, shared by count - 1 gives the time per command, at least the line time
+        # to be called before the other threads use the port
+        # output : time per command in s, None if the radio didn't answer them all
+        ########################################
+        with self.lock:
+            if not self.connected:
+                return None
+            try:
+                single = self.probe(1)
+                burst = self.probe(count)
+            except (SerialException, OSError) as msg:
+                print("Serial exception in calibrate :",msg)
+                self.port_lost(msg)
+                return None
+        if single is None or burst is None:
+            return None
+        bits = 1 + self.bytesize + (self.parity != 'N') + self.stopbits
+        return max((burst - single) / (count - 1),(len(PROBE) + 1) * bits / self.baudrate)
+
+    def probe(self,count:int,timeout=0.5) -> float:
+        # count probes in one write, time until all the answers are in, None if not
+        self.serial.reset_input_buffer()
+        data = (PROBE + ';').encode() * count
+        sent = perf_counter()
+        self.serial.write(data)
+        if self.recorder:
+            self.recorder.record(CAT_TX,data)
+        received = b''
+        while received.count(PROBE.encode()) < count:
+            if perf_counter() > sent + timeout:
+                return None
+            waiting = self.serial.in_waiting
+            if not waiting:
+                sleep(0.0005)
+                continue
+            received += self.serial.read(waiting)
+        elapsed = perf_counter() - sent
+        if self.recorder:
+            self.recorder.record(CAT_RX,received)
+        return elapsed
+
+    def pacing_report(self) -> dict:
+        ########################################
+        # achieved vs theoretical throughput
+        # theoretical : commands per second the radio can take, for the average command length written
+        # output : {'link_rate':bytes/s,'command_cost':s,'theoretical':commands/s,'peak':commands/s,'paced':writes}
+        ########################################
+        length = self.sent_bytes / self.sent_commands if self.sent_commands else 7
+        per_command = max(self.command_cost,length / self.link_rate) if self.link_rate else 0
+        return {'link_rate':self.link_rate, 'command_cost':self.command_cost,
+                'theoretical':1 / per_command if per_command else 0, 'peak':self.peak, 'paced':self.paced}
+
+    def start_writer(self,maxlag=0.3):
+        ########################################
+        # starts the thread writing the continuous controls posted
+        # maxlag : max age in s of a jog move when it reaches the radio, older ones are shed
+        ########################################
+        self.maxlag = maxlag
+        self.writing = True
+        metrics.gauge('writer_queue_depth',lambda: len(self.latest))
+        self.writer_thread = threading.Thread(target=self.writer, daemon=True, name='CAT writer')
+        self.writer_thread.start()
+
+    def stop_writer(self):
+        with self.queued:
+            self.writing = False
+            self.queued.notify()
+
+    def post(self,command:str,stamp=None,relative=False):
+        ########################################
+        # usage post('AG0120',stamp) for a pot, post('UD0005',stamp,True) for a jog
+        # hands the command of a continuous control to the writer thread, never blocks
+        # only the last value of a pot is kept, the moves of a jog are counted
+        # so what waits for the port is bounded, whatever the MIDI input rate
+        # input : command without ;
+        #         stamp : perf_counter() time of the MIDI event
+        #         relative : True for moves (UD, RU, RD...), False for values (AG, PC, SH...)
+        # buttons must not be posted, they go with query() and are never shed
+        # query() and send() write what is posted first, so a button can't overtake a pot
+        ########################################
+        if not self.writing:                                    # no writer, sent at once as before
+            self.query(command,0)
+            return
+        now = perf_counter()
+        if stamp is None:
+            stamp = now
+        if relative and now - stamp > self.maxlag:              # already too old
+            metrics.inc('shed_stale')
+            return
+        key = command if relative else command[:2]
+        with self.queued:
+            waiting = self.latest.get(key)
+            if waiting is None:
+                self.latest[key] = [command,1,stamp,relative]
+            elif relative:                                      # one more move, the newest gives the age
+                waiting[1] += 1
+                waiting[2] = max(waiting[2],stamp)
+            else:                                               # a newer value replaces the waiting one
+                waiting[0] = command
+                waiting[2] = stamp
+                metrics.inc('shed_merged')
+            self.queued.notify()
+
+    def writer(self):
+        ########################################
+        # writer thread : sends the posted commands, oldest key first
+        # moves waiting longer than maxlag are shed, the last value of a pot is always sent
+        ########################################
+        while True:
+            with self.queued:
+                while self.writing and not self.latest:
+                    self.queued.wait()
+                if not self.writing:
+                    return
+            with self.lock:                                     # no query between the pop and the write
+                with self.queued:
+                    if not self.latest:                         # already written by a flush
+                        continue
+                    key = next(iter(self.latest))
+                    posted = self.latest.pop(key)
+                self.flushing = True
+                try:
+                    self.write_posted(*posted)
+                finally:
+                    self.flushing = False
+
+    def flush(self):
+        ########################################
+        # writes at once all that waits for the writer thread
+        # called by query() and send() with the port lock held, before their own command
+        ########################################
+        with self.queued:
+            posted = list(self.latest.values())
+            self.latest.clear()
+        self.flushing = True
         try:
-            self.serial.write(datastosend.encode())
-        except SerialException as msg:
-            print('Exception in send :',msg)
-            self.close_comport()
+            for command, count, stamp, relative in posted:
+                self.write_posted(command,count,stamp,relative)
+        finally:
+            self.flushing = False
+
+    def write_posted(self,command:str,count:int,stamp:float,relative:bool):
+        # writes a posted command, moves waiting longer than maxlag are shed
+        lag = perf_counter() - stamp
+        if relative and lag > self.maxlag:                      # moves, too late
+            metrics.inc('shed_stale',count)
+            if DEBUG:
+                print("Shed %d x %s, %.0f ms late" % (count,command,lag * 1000))
+            return
+        self.query(';'.join([command] * count),0)              # the moves in one write
+        metrics.observe('control_lag',perf_counter() - stamp)
+
+    def send(self,datastosend):
+        # sends commands as they are, str or bytes already encoded, no answer awaited
+        if isinstance(datastosend,str):
+            datastosend = datastosend.encode()
+        self.waiting.append(1)              # tell low priority traffic we're here
+        with self.lock:
+            self.waiting.pop()
+            if self.latest and not self.flushing:     # the pots and jogs moved before go first
+                self.flush()
+            self.track(datastosend.decode())
+            if not self.connected:
+                return
+            try:
+                self.pace(datastosend)
+                self.serial.write(datastosend)
+                metrics.inc('cat_commands',datastosend.count(b';'))
+                if self.recorder:
+                    self.recorder.record(CAT_TX,datastosend)
+            except (SerialException, OSError) as msg:
+                print('Exception in send :',msg)
+                self.port_lost(msg)
 
     def read(self) -> str:
         ########################################
         # read datas from radio
+        # while a pipeline waits for its answers nothing is read, so they aren't taken,
+        # the other frames the pipeline has read are given here
         ########################################
+        if not self.connected:
+            return None
         try:
-            received_data = self.serial.read_until(';')    # read serial port until we get a ; separator
-            data_left = self.serial.inWaiting()            # check for remaining bytes
-            received_data += self.serial.read(data_left)   # add remaining datas to buffer
-            received_datas = (received_data.decode())   # decode in ASCII
+            with self.lock:
+                if self.collecting:
+                    return ''
+                received_data = self.serial.read_until(';')    # read serial port until we get a ; separator
+                data_left = self.serial.inWaiting()            # check for remaining bytes
+                received_data += self.serial.read(data_left)   # add remaining datas to buffer
+                unclaimed = self.unclaimed
+                self.unclaimed = ''
+            if self.recorder and received_data:
+                self.recorder.record(CAT_RX,received_data)
+            received_datas = unclaimed + (received_data.decode())   # decode in ASCII
             if DEBUG:
                 print (received_datas)
             return received_datas
-        except SerialException as msg:
+        except (SerialException, OSError) as msg:
             print("Serial exception in KwdCat.read function:",msg)
+            self.port_lost(msg)
             return None
         except:
             print("Exception in KwdCat.read function")
@@ -129,27 +515,56 @@ class KwdCat(object):
         # e.g send IF
         # returns IF00014050380      040000041020000080
         ########################################
-        #if self.serial.isOpen:
-            self.serial.reset_input_buffer()                    # flush the input buffer so we don't collect answers to other commands coming from other software
+        self.waiting.append(1)                                  # tell low priority traffic (meter...) we're here
+        with self.lock:
+            self.waiting.pop()
+            if self.latest and not self.flushing:              # the pots and jogs moved before go first
+                self.flush()
             send_string = f"{request.strip()};"                 # remove whitespaces if any and append terminator ;
+            if not self.connected:                              # port lost, keep or drop the command, see REPLAY_POLICY
+                self.track(send_string,length == 0)
+                return None
+            self.track(send_string)
             try:
+                if length != 0:
+                    self.serial.reset_input_buffer()            # flush the input buffer so we don't collect answers to other commands coming from other software
+                self.pace(send_string.encode())                 # the radio not overrun
+                sent = perf_counter()
                 self.serial.write(send_string.encode())         # send data to serial port
-            except SerialException as msg:
+                metrics.inc('cat_commands',send_string.count(';'))
+                if self.recorder:
+                    self.recorder.record(CAT_TX,send_string.encode())
+            except (SerialException, OSError) as msg:
                 print("Serial exception in query send function",msg)
-                pass
+                self.port_lost(msg)
+                return None
 
             if length != 0:             #if we expect an answer
                 try:
-                    sleep(0.1)      # time to answer
-                    recvd_data = self.serial.read_until(';')    # read serial port until we get a ; separator
-                    data_left = self.serial.inWaiting()            # check for remaining bytes
-                    recvd_data += self.serial.read(data_left)   # add remaining datas to buffer
+                    ## read what comes until the whole answer is in, 0.1 s max to answer
+                    ## the round trip time is measured up to the end of the answer
+                    expected = request.strip().encode()
+                    recvd_data = b''
+                    deadline = sent + 0.1
+                    while perf_counter() < deadline:
+                        data_left = self.serial.in_waiting      # check for bytes received
+                        if not data_left:
+                            sleep(0.001)
+                            continue
+                        recvd_data += self.serial.read(data_left)   # add them to buffer
+                        start = recvd_data.find(expected)
+                        if start != -1 and len(recvd_data) > start + length:
+                            metrics.observe('query_rtt',perf_counter() - sent)
+                            break
+                    if self.recorder:
+                        self.recorder.record(CAT_RX,recvd_data)
                     answer = (recvd_data.decode())   # decode in ASCII
                     if DEBUG:
                         print ("Answer =",answer,"len=",len(answer))
-                except SerialException as msg:
+                except (SerialException, OSError) as msg:
                     print("Serial exception in query read function :",msg)
-                    pass
+                    self.port_lost(msg)
+                    return None
 
                 ## find a block starting with the requested command
                 ## and extract the full answer
@@ -165,6 +580,90 @@ class KwdCat(object):
                 else:
                     return
 
+    def pipeline(self,requests:list,timeout=0.05,wait=False,then='') -> dict:
+        ########################################
+        # usage pipeline(['SM0','RM'])
+        # low priority pipelined reads, e.g for the meters
+        # all requests are sent in a single write, then the answers are collected as they come
+        # the port is released while waiting for the radio, so control commands can go in between
+        # gives way if a control command is waiting, never blocks it
+        # input : requests:list of Kenwood read commands, without ;
+        #         timeout: max time to wait for the answers, in s
+        #         wait: True to wait for the port instead of giving way, for reads asked by the operator
+        #         then: commands sent in the same write after the reads, e.g the next scan frequency
+        # output : dict {request:answer} with the answers received in time, None if nothing was sent
+        ########################################
+        if not self.connected:
+            return None
+        if wait:
+            self.lock.acquire()
+        elif self.waiting:                                      # control commands first
+            metrics.inc('pipeline_skipped')
+            return None
+        elif not self.lock.acquire(blocking=False):             # port busy, skip this cycle
+            metrics.inc('pipeline_skipped')
+            return None
+        try:
+            self.collecting += 1
+            send_string = ';'.join(requests) + ';'
+            if then:
+                send_string += then.strip(';') + ';'
+                self.track(then)
+            self.pace(send_string.encode())
+            sent = perf_counter()
+            self.serial.write(send_string.encode())
+            metrics.inc('cat_commands',send_string.count(';'))
+            if self.recorder:
+                self.recorder.record(CAT_TX,send_string.encode())
+        except (SerialException, OSError) as msg:
+            print("Serial exception in pipeline send function",msg)
+            self.collecting -= 1
+            self.port_lost(msg)
+            return None
+        finally:
+            self.lock.release()
+
+        answers = {}
+        buffer = ''
+        end = perf_counter() + timeout
+        try:
+            while len(answers) < len(requests) and perf_counter() < end:
+                sleep(0.002)
+                with self.lock:
+                    if not self.connected:
+                        break
+                    try:
+                        received = self.serial.read(self.serial.in_waiting)
+                        if self.recorder and received:
+                            self.recorder.record(CAT_RX,received)
+                        buffer += received.decode(errors='ignore')
+                    except (SerialException, OSError) as msg:
+                        print("Serial exception in pipeline read function",msg)
+                        self.port_lost(msg)
+                        break
+                frames = buffer.split(';')
+                buffer = frames.pop()                           # keep the incomplete frame for next read
+                for frame in frames:
+                    claimed = False
+                    for request in requests:
+                        if frame.startswith(request[:2]):       # e.g SM00012 answers SM0
+                            answers[request] = frame
+                            claimed = True
+                    if not claimed and frame:                   # e.g an answer to a logging software
+                        with self.lock:
+                            self.unclaimed = (self.unclaimed + frame + ';')[-1024:]
+            if buffer:                                          # the rest, for the sniffer
+                with self.lock:
+                    self.unclaimed = (self.unclaimed + buffer)[-1024:]
+        finally:
+            with self.lock:
+                self.collecting -= 1
+        if len(answers) == len(requests):
+            metrics.observe('pipeline_rtt',perf_counter() - sent)
+        if DEBUG:
+            print("Pipeline answers :",answers)
+        return answers
+
     def checkradio(self) -> bool:
         #################################################
         # Check if Radio answering
@@ -268,6 +767,35 @@ class KwdCat(object):
                 print("PC frame wrong decoding")
             return None
 
+    def ReadCmdSM(self,cmd:str)->int:
+        ###########################################
+        # extracts the S-meter value from SM command like SM00012
+        # in TX, the TS590 gives the power meter value
+        # input:str must be 7 char.
+        # output:int 0000-0030
+        ###########################################
+        pattern = re.compile(r"SM[0-9]{5}")
+        if cmd is not None and pattern.match(cmd):
+            return int(cmd[3:7])
+        else:
+            if DEBUG:
+                print("SM frame wrong decoding")
+            return None
+
+    def ReadCmdRM(self,cmd:str)->list:
+        ###########################################
+        # extracts the meter reading from RM command like RM10005
+        # input:str must be 7 char.
+        # output:list meter 1=SWR 2=COMP 3=ALC, value 0000-0030
+        ###########################################
+        pattern = re.compile(r"RM[0-3][0-9]{4}")
+        if cmd is not None and pattern.match(cmd):
+            return [int(cmd[2]),int(cmd[3:7])]
+        else:
+            if DEBUG:
+                print("RM frame wrong decoding")
+            return None
+
     def ConvertMode(self,modenr:int) -> str:
         ########################################
         # returns readable mode  CW/LSB/RTTY etc from mode number
@@ -285,17 +813,17 @@ class KwdCat(object):
     def FreqDown(self,step:int):            # like UP/DWN on mike, step 0-99
         self.query('DN',0)
 
-    def VFOfreq(self,vfo=0,up=0,step=1):    # change VFO A/B freq, direction, step
+    def VFOfreq(self,vfo=0,up=0,step=1,stamp=None):    # change VFO A/B freq, direction, step
         self.vfo = vfo                      # 0 =VFO A
         self.dir = up                       # 0 = up
         self.step = step                    # 1 = 1 step
         cmd='UD'
         strCat = f'{cmd}{self.vfo}{self.dir}{self.step:02}'
-        self.query(strCat,0)
-    def RITUp(self):
-        self.query('RU',0)
-    def RITDown(self):
-        self.query('RD',0)
+        self.post(strCat,stamp,True)
+    def RITUp(self,stamp=None):
+        self.post('RU',stamp,True)
+    def RITDown(self,stamp=None):
+        self.post('RD',stamp,True)
     def RITOnOff(self,state:int):
         self.state = state
         if self.state == 0:
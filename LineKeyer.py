@@ -0,0 +1,108 @@
+#-------------------------------------------------------------------------------
+# Name:        LineKeyer
+# Purpose:     PTT and straight key CW on the RTS or DTR line of the COM port
+#              the line is set at once from the MIDI event, without going through
+#              the CAT commands, as the radio USB keying menu expects it
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 RTS/DTR keyer"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import threading
+from time import perf_counter
+from Metrics import metrics
+
+## the modem control lines which can key the radio
+LINES = ('rts','dtr')
+
+class LineKeyer(object):
+    """
+    class keying the radio with the RTS or DTR line of its COM port
+    """
+    def __init__(self,radio,ptt='rts',key='dtr',maxtx=180,changed=None):
+        # radio : an opened KwdCat, its lines must be at 0 when not keying
+        # ptt : line for the PTT, key : line for the CW key, '' if not used
+        # maxtx : the PTT is released after maxtx s, so a latched PTT isn't forgotten on air, 0 never
+        # changed : called with ('ptt' or 'key',state) after the line is set, e.g for the LEDs
+        self.radio = radio
+        self.changed = changed
+        self.lines = {'ptt':ptt,'key':key}
+        self.maxtx = maxtx
+        self.state = {'ptt':False,'key':False}
+        self.timer = None
+        self.latency = 0.0                  # last MIDI event to line change, in s
+
+    def set(self,what:str,state:bool,stamp=None) -> bool:
+        ########################################
+        # sets the PTT or the key, at once
+        # what : 'ptt' or 'key'
+        # stamp : perf_counter() time of the MIDI event, for the latency
+        # output : True if the line has been set
+        ########################################
+        line = self.lines.get(what)
+        if not line or not self.radio.set_line(line,state):
+            return False
+        now = perf_counter()
+        self.state[what] = state
+        if stamp is not None:
+            self.latency = now - stamp
+            metrics.observe('key_latency',self.latency)
+        metrics.inc('key_changes')
+        if what == 'ptt':
+            self.watchdog(state)
+        if self.changed:
+            self.changed(what,state)
+        if DEBUG:
+            print("%s %s, %.2f ms after the MIDI event" % (what.upper(),'ON' if state else 'OFF',self.latency * 1000))
+        return True
+
+    def toggle(self,what:str,stamp=None) -> bool:
+        # latching, returns the new state
+        self.set(what,not self.state[what],stamp)
+        return self.state[what]
+
+    def watchdog(self,state:bool):
+        # releases the PTT after maxtx s
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        if state and self.maxtx:
+            self.timer = threading.Timer(self.maxtx,self.timeout)
+            self.timer.daemon = True
+            self.timer.start()
+
+    def timeout(self):
+        print("\nPTT released after %g s" % self.maxtx)
+        self.set('ptt',False)
+
+    def reset(self):
+        # the COM port has been lost, its lines are back at 0 once it is opened again
+        # nothing is keyed any more, the timer and the LEDs follow
+        if self.timer:
+            self.timer.cancel()
+            self.timer = None
+        self.state = {'ptt':False,'key':False}
+        if self.changed:
+            self.changed('ptt',False)
+            self.changed('key',False)
+
+    def release(self):
+        # PTT and key up, e.g at exit
+        for what in ('key','ptt'):
+            if self.state[what]:
+                self.set(what,False)
+
+
+if __name__ == "__main__":
+  print ("%s" %(__Title))
+  print ("Version %s, date : %s" % (__Version, __VersionDate))
+  print ("This is a library, to be called from other modules. It does nothing by itself.")
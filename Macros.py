@@ -0,0 +1,159 @@
+#-------------------------------------------------------------------------------
+# Name:        Macros
+# Purpose:     CAT command sequences bound to pads
+#              checked and encoded when the ini file is read, so a pad press
+#              costs one write per part of the macro between two waits
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 macros"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import re
+import threading
+from time import sleep
+from Metrics import metrics
+from KwdCat import READ_REQUEST
+from RadioState import MODES
+
+## Syntax, steps separated by ;
+##   FA00014074000      a CAT command
+##   CW,CW-R?KS025      a CAT command only sent in these modes
+##   wait 200           a delay in ms, the commands before and after go in 2 writes
+##   check              last step, reads back the settings sent and shows the differences
+COMMAND = re.compile(r"^[A-Z]{2}[0-9A-Z +-]*$")
+WAIT = re.compile(r"^WAIT\s+([0-9]+)$")
+
+def CompileMacro(text:str) -> tuple:
+########################################
+# checks a macro and encodes its writes for each mode
+# output : ({mode:[(bytes to write,delay in s after)]}, check:bool)
+# raises ValueError on a wrong step
+########################################
+    steps = []                                      # [(modes or None,command)] and [(None,delay)]
+    check = False
+    for step in text.split(';'):
+        step = step.strip().upper()
+        if not step:
+            continue
+        if step == 'CHECK':
+            check = True
+            continue
+        wait = WAIT.match(step)
+        if wait:
+            steps.append(('wait',int(wait.group(1)) / 1000))
+            continue
+        modes = None
+        if '?' in step:
+            condition, step = step.split('?',1)
+            modes = [mode.strip() for mode in condition.split(',')]
+            unknown = [mode for mode in modes if mode not in MODES.values()]
+            if unknown:
+                raise ValueError("unknown mode " + ','.join(unknown))
+            step = step.strip()
+        if not COMMAND.match(step):
+            raise ValueError("wrong command " + step)
+        steps.append((modes,step))
+    if not any(modes != 'wait' for modes,step in steps):
+        raise ValueError("no command")
+
+    compiled = {}
+    for mode in list(MODES.values()) + ['']:        # '' mode unknown, only the commands without condition
+        writes = []
+        commands = []
+        for modes,step in steps + [('wait',0)]:
+            if modes == 'wait':
+                if commands:
+                    writes.append((';'.join(commands) + ';',step))
+                    commands = []
+                elif writes:                        # two waits in a row add up
+                    writes[-1] = (writes[-1][0],writes[-1][1] + step)
+            elif modes is None or mode in modes:
+                commands.append(step)
+        if writes:                                  # nothing to wait for after the last write
+            writes[-1] = (writes[-1][0],0)
+        compiled[mode] = [(data.encode(),delay) for data,delay in writes]
+    return compiled, check
+
+
+class Macros(object):
+    """
+    class running the macros of the [Macros] section
+    """
+    def __init__(self,radio,state,macros:dict):
+        # radio : an opened KwdCat
+        # state : the RadioState, for the mode conditions
+        # macros : {name:text}, wrong ones are shown and ignored
+        self.radio = radio
+        self.state = state
+        self.macros = {}
+        for name,text in macros.items():
+            try:
+                self.macros[name.lower()] = CompileMacro(text)
+            except ValueError as msg:
+                print("Macros section, wrong macro ignored :",name,"=",text,"(%s)" % msg)
+
+    def play(self,name:str) -> bool:
+        ########################################
+        # runs a macro, at once if it is one single write without check
+        # else in a thread, so the controller isn't blocked by the waits
+        ########################################
+        macro = self.macros.get(name.lower())
+        if macro is None:
+            print("Macro",name,"not found in [Macros]")
+            return False
+        compiled, check = macro
+        writes = compiled.get(self.state.mode,compiled[''])
+        if not writes:
+            return False
+        metrics.inc('macro_runs')
+        if len(writes) == 1 and not check:
+            self.write(writes[0][0])
+        else:
+            threading.Thread(target=self.run, args=(name,writes,check), daemon=True, name='Macro').start()
+        return True
+
+    def write(self,data:bytes):
+        self.radio.send(data)
+        self.state.decode(data.decode())            # LEDs follow what the macro set
+        metrics.inc('macro_writes')
+
+    def run(self,name:str,writes:list,check:bool):
+        for data,delay in writes:
+            self.write(data)
+            if delay:
+                sleep(delay)
+        if check:
+            self.check(name,writes)
+
+    def check(self,name:str,writes:list):
+        ########################################
+        # reads back the settings sent, in one pipelined read
+        ########################################
+        sent = {}
+        for data,delay in writes:
+            for command in data.decode().split(';'):
+                if len(command) > 2:                # settings, not actions
+                    sent[READ_REQUEST.get(command[:2],command[:2])] = command
+        answers = self.radio.pipeline(list(sent),timeout=0.3,wait=True) or {}
+        wrong = [command for request,command in sent.items() if request in answers and answers[request] != command]
+        missing = [command for request,command in sent.items() if request not in answers]
+        if wrong or missing:
+            metrics.inc('macro_check_failed')
+            print("Macro",name,"not applied :",';'.join(wrong),"no answer :",';'.join(missing))
+        else:
+            print("Macro",name,"checked")
+
+
+if __name__ == "__main__":
+  print ("%s" %(__Title))
+  print ("Version %s, date : %s" % (__Version, __VersionDate))
+  print ("This is a library, to be called from other modules. It does nothing by itself.")
@@ -0,0 +1,156 @@
+#-------------------------------------------------------------------------------
+# Name:        Metrics
+# Purpose:     Live runtime counters and gauges of midi2ts590
+#              served on a local HTTP endpoint, Prometheus text format
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 runtime metrics"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import json
+import threading
+from time import time, sleep
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+## upper bounds of the timing histograms buckets, in s
+BUCKETS = (0.001,0.002,0.005,0.01,0.02,0.05,0.1,0.2,0.5,1.0)
+
+class Metrics(object):
+    """
+    class holding counters, gauges and timings, cheap to update from any thread
+    """
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.counters = {}      # {name:total}
+        self.rates = {}         # {name:increase during the last second}
+        self.gauges = {}        # {name:function returning the value}
+        self.timings = {}       # {name:[count,sum,max,[bucket counts]]}
+        self.start = time()
+        self.server = None
+
+    def inc(self,name:str,n=1):
+        # adds n to a counter
+        with self.lock:
+            self.counters[name] = self.counters.get(name,0) + n
+
+    def gauge(self,name:str,function):
+        # registers a gauge, function is called when the metrics are read, e.g lambda: len(queue)
+        self.gauges[name] = function
+
+    def observe(self,name:str,seconds:float):
+        # adds a duration to a timing, e.g a query round trip
+        with self.lock:
+            timing = self.timings.get(name)
+            if timing is None:
+                timing = self.timings[name] = [0,0.0,0.0,[0] * len(BUCKETS)]
+            timing[0] += 1
+            timing[1] += seconds
+            if seconds > timing[2]:
+                timing[2] = seconds
+            for i,bound in enumerate(BUCKETS):
+                if seconds <= bound:
+                    timing[3][i] += 1
+                    break
+
+    def tick(self):
+        # computes the per second rates of the counters, once per second
+        last = {}
+        while True:
+            sleep(1)
+            with self.lock:
+                self.rates = {name:total - last.get(name,0) for name,total in self.counters.items()}
+                last = dict(self.counters)
+
+    def snapshot(self) -> dict:
+        ########################################
+        # all the metrics as a dict
+        ########################################
+        with self.lock:
+            values = {'uptime':time() - self.start,
+                      'counters':dict(self.counters),
+                      'rates':dict(self.rates),
+                      'timings':{name:{'count':t[0],'sum':t[1],'max':t[2],'buckets':list(t[3])} for name,t in self.timings.items()}}
+        gauges = {}
+        for name,function in list(self.gauges.items()):
+            try:
+                gauges[name] = function()
+            except Exception:               # e.g object not created yet
+                gauges[name] = None
+        values['gauges'] = gauges
+        return values
+
+    def text(self) -> str:
+        ########################################
+        # all the metrics in Prometheus text format
+        ########################################
+        values = self.snapshot()
+        lines = ['midi2ts590_uptime_seconds %.1f' % values['uptime']]
+        for name,total in sorted(values['counters'].items()):
+            lines.append('midi2ts590_%s_total %d' % (name,total))
+            lines.append('midi2ts590_%s_per_second %d' % (name,values['rates'].get(name,0)))
+        for name,value in sorted(values['gauges'].items()):
+            if value is not None:
+                lines.append('midi2ts590_%s %s' % (name,value))
+        for name,timing in sorted(values['timings'].items()):
+            cumul = 0
+            for bound,count in zip(BUCKETS,timing['buckets']):
+                cumul += count
+                lines.append('midi2ts590_%s_seconds_bucket{le="%g"} %d' % (name,bound,cumul))
+            lines.append('midi2ts590_%s_seconds_bucket{le="+Inf"} %d' % (name,timing['count']))
+            lines.append('midi2ts590_%s_seconds_sum %f' % (name,timing['sum']))
+            lines.append('midi2ts590_%s_seconds_count %d' % (name,timing['count']))
+            lines.append('midi2ts590_%s_seconds_max %f' % (name,timing['max']))
+        return '\n'.join(lines) + '\n'
+
+    def serve(self,port=9590):
+        ########################################
+        # serves the metrics on http://127.0.0.1:port/metrics (text)
+        # and http://127.0.0.1:port/metrics.json
+        ########################################
+        metrics = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path == '/metrics.json':
+                    body, kind = json.dumps(metrics.snapshot()).encode(), 'application/json'
+                elif self.path in ('/','/metrics'):
+                    body, kind = metrics.text().encode(), 'text/plain; version=0.0.4'
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header('Content-Type',kind)
+                self.send_header('Content-Length',str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            def log_message(self,format,*args):     # no console output for each request
+                if DEBUG:
+                    BaseHTTPRequestHandler.log_message(self,format,*args)
+
+        self.server = ThreadingHTTPServer(('127.0.0.1',port),Handler)
+        self.server.daemon_threads = True
+        threading.Thread(target=self.server.serve_forever, daemon=True, name='Metrics server').start()
+        threading.Thread(target=self.tick, daemon=True, name='Metrics tick').start()
+
+    def stop(self):
+        if self.server:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+## the metrics of the process, updated by all modules
+metrics = Metrics()
+
+
+if __name__ == "__main__":
+  print ("%s" %(__Title))
+  print ("Version %s, date : %s" % (__Version, __VersionDate))
+  print ("This is a library, to be called from other modules. It does nothing by itself.")
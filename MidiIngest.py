@@ -0,0 +1,171 @@
+#-------------------------------------------------------------------------------
+# Name:        MidiIngest
+# Purpose:     Reads the MIDI input device in its own process
+#              so the serial I/O and the threads of the main process can't delay it
+#              the events are timestamped and pushed in a shared memory ring
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 MIDI ingest process"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import struct
+import multiprocessing
+from multiprocessing import shared_memory
+from time import sleep, perf_counter
+from Metrics import metrics
+
+## Ring layout, one writer (the ingest process) and one reader (the main process), no lock
+## header : write index, read index, overflows, state
+##          the write index and the overflows are only written by the ingest process
+##          the read index is only written by the main process
+## slots  : MIDI status, data1, data2, data3, MIDI timestamp in ms, capture time (perf_counter)
+## the event n is in slot n % size, an event is written before the write index is moved past it
+HEADER = struct.Struct('<QQQQ')
+INDEX = struct.Struct('<Q')
+SLOT = struct.Struct('<BBBBId')
+WRITE = 0
+READ = 8
+OVERFLOWS = 16
+STATE = 24
+
+## states of the ingest process
+STARTING = 0
+RUNNING = 1
+FAILED = 2
+
+
+def IngestProcess(name:str,device:int,size:int,stop):
+########################################
+# the ingest process : polls the MIDI device and fills the ring
+# when the ring is full the event is dropped and counted, the reader is never waited for
+########################################
+    from os import environ
+    environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
+    import pygame.midi
+    ring = shared_memory.SharedMemory(name=name)
+    buf = ring.buf
+    try:
+        pygame.midi.init()
+        midi_in = pygame.midi.Input(device)
+    except Exception as msg:
+        print("MIDI ingest, device error :",msg)
+        INDEX.pack_into(buf,STATE,FAILED)
+        ring.close()
+        return
+    INDEX.pack_into(buf,STATE,RUNNING)
+    write = INDEX.unpack_from(buf,WRITE)[0]
+    overflows = 0
+    while not stop.is_set():
+        if midi_in.poll():
+            for data, miditime in midi_in.read(64):
+                now = perf_counter()
+                if write - INDEX.unpack_from(buf,READ)[0] >= size:     # full, the reader is late
+                    overflows += 1
+                    INDEX.pack_into(buf,OVERFLOWS,overflows)
+                    continue
+                SLOT.pack_into(buf,HEADER.size + (write % size) * SLOT.size,
+                               data[0],data[1],data[2],data[3],miditime & 0xFFFFFFFF,now)
+                write += 1
+                INDEX.pack_into(buf,WRITE,write)                     # publish the event
+        sleep(0.00001)
+    midi_in.close()
+    pygame.midi.quit()
+    del buf
+    ring.close()
+
+
+class MidiIngest(object):
+    """
+    class reading the MIDI events from the ingest process
+    poll() and read() behave like the ones of pygame.midi.Input
+    """
+    def __init__(self,device:int,size=1024):
+        # device : MIDI input device number
+        # size : number of events the ring can hold
+        self.device = device
+        self.size = size
+        self.ring = shared_memory.SharedMemory(create=True,size=HEADER.size + size * SLOT.size)
+        HEADER.pack_into(self.ring.buf,0,0,0,0,STARTING)
+        self.read_index = 0
+        self.dropped = 0                    # overflows already counted in midi_dropped
+        self.offset = None                  # smallest capture time - MIDI time seen, for the jitter
+        self.context = multiprocessing.get_context('spawn')     # a fresh process, nothing of pygame inherited
+        self.stop_event = self.context.Event()
+        self.process = None
+        metrics.gauge('midi_ring_overflows',lambda: self.overflows())
+        metrics.gauge('midi_ring_depth',lambda: self.depth())
+
+    def start(self,timeout=5.0) -> bool:
+        ########################################
+        # starts the ingest process and waits until the device is opened
+        # returns False if the device could not be opened
+        ########################################
+        self.process = self.context.Process(target=IngestProcess,
+                                            args=(self.ring.name,self.device,self.size,self.stop_event),
+                                            daemon=True, name='MIDI ingest')
+        self.process.start()
+        deadline = perf_counter() + timeout
+        while perf_counter() < deadline and self.process.is_alive():
+            state = INDEX.unpack_from(self.ring.buf,STATE)[0]
+            if state != STARTING:
+                return state == RUNNING
+            sleep(0.01)
+        return False
+
+    def close(self):
+        self.stop_event.set()
+        if self.process:
+            self.process.join(1)
+        self.ring.close()
+        self.ring.unlink()
+
+    def overflows(self) -> int:
+        return INDEX.unpack_from(self.ring.buf,OVERFLOWS)[0]
+
+    def depth(self) -> int:
+        return INDEX.unpack_from(self.ring.buf,WRITE)[0] - self.read_index
+
+    def poll(self) -> bool:
+        return INDEX.unpack_from(self.ring.buf,WRITE)[0] != self.read_index
+
+    def read(self,count:int) -> list:
+        ########################################
+        # takes up to count events from the ring
+        # output : list of [[status,data1,data2,data3],timestamp] as pygame.midi.Input.read
+        # the time spent in the ring and the capture jitter go to the metrics
+        ########################################
+        buf = self.ring.buf
+        write = INDEX.unpack_from(buf,WRITE)[0]
+        last = min(write,self.read_index + count)
+        events = []
+        now = perf_counter()
+        for index in range(self.read_index,last):
+            status, data1, data2, data3, miditime, captured = SLOT.unpack_from(buf,HEADER.size + (index % self.size) * SLOT.size)
+            events.append([[status,data1,data2,data3],miditime])
+            metrics.observe('midi_ring_delay',now - captured)
+            offset = captured - miditime / 1000     # late capture shows as a larger offset
+            if self.offset is None or offset < self.offset:
+                self.offset = offset
+            metrics.observe('midi_capture_jitter',offset - self.offset)
+        self.read_index = last
+        INDEX.pack_into(buf,READ,last)              # frees the slots for the ingest process
+        overflows = self.overflows()
+        if overflows != self.dropped:               # same counter as without the ingest process
+            metrics.inc('midi_dropped',overflows - self.dropped)
+            self.dropped = overflows
+        return events
+
+
+if __name__ == "__main__":
+  print ("%s" %(__Title))
+  print ("Version %s, date : %s" % (__Version, __VersionDate))
+  print ("This is a library, to be called from other modules. It does nothing by itself.")
@@ -0,0 +1,159 @@
+#-------------------------------------------------------------------------------
+# Name:        Profiler
+# Purpose:     A sampling profiler for the live process, started with --profile
+#              the stacks of all threads are sampled a number of times per second
+#              and written as collapsed stacks, for flamegraph.pl or speedscope
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 sampling profiler"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import os
+import sys
+import atexit
+import signal
+import linecache
+import threading
+from collections import Counter
+from time import sleep, perf_counter
+
+## where the time goes, from the innermost function of a sample found here
+## the samples without any of these functions are counted as 'other'
+CATEGORIES = {
+    'DJ_scan':'MIDI handling', 'DJ_event':'MIDI handling', 'PadAction':'MIDI handling',
+    'query':'CAT query wait', 'pipeline':'CAT query wait', 'checkradio':'CAT query wait',
+    'send':'CAT writes', 'post':'CAT writes', 'writer':'CAT writes', 'write_posted':'CAT writes',
+    'read':'CAT reads',
+    'decode':'decoding', 'ReadCmdIF':'decoding', 'ReadCmdFAFB':'decoding', 'ReadCmdXI':'decoding',
+    'ReadCmdSM':'decoding', 'ReadCmdRM':'decoding', 'MakeDJequalRadio':'decoding',
+    'frame':'MIDI writes', 'compose':'MIDI writes', 'set_many':'MIDI writes',
+}
+## idle when the innermost function is one of these, waiting for something to do
+IDLE = ('<module>','wait','sleep','pollRadio','SniffRadio','MeterRadio','SuperviseRadio','serve_forever','refresher')
+
+class Profiler(object):
+    """
+    class sampling the stacks of all the threads of the process
+    """
+    def __init__(self,filename='midi2ts590.prof',rate=100):
+        # filename : collapsed stacks output, one line per stack : thread;outer;...;inner count
+        # rate : samples per second, 100 costs about 1% of one core
+        self.filename = filename
+        self.rate = rate
+        self.stacks = Counter()             # {collapsed stack:samples}
+        self.samples = 0
+        self.started = None
+        self.running = False
+        self.thread = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        ########################################
+        # starts sampling, to be called from the main thread
+        # the stacks are written at exit and on SIGUSR1 (Linux) or CTRL-BREAK (Windows)
+        ########################################
+        self.running = True
+        self.started = perf_counter()
+        self.thread = threading.Thread(target=self.run, daemon=True, name='Profiler')
+        self.thread.start()
+        atexit.register(self.stop)
+        dumpsignal = getattr(signal,'SIGUSR1',None) or getattr(signal,'SIGBREAK',None)
+        if dumpsignal:
+            signal.signal(dumpsignal,lambda signum,frame: self.dump())
+
+    def stop(self):
+        # stops sampling and writes the stacks, only once
+        if not self.running:
+            return
+        self.running = False
+        self.thread.join()
+        self.dump()
+
+    def run(self):
+        # the sampling loop, one sample every 1/rate s
+        period = 1 / self.rate
+        me = threading.get_ident()
+        nexttime = perf_counter()
+        while self.running:
+            self.sample(me)
+            nexttime += period
+            delay = nexttime - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            else:
+                nexttime = perf_counter()           # late, don't try to catch up
+
+    def sample(self,me:int):
+        ########################################
+        # one sample of each thread but the profiler one
+        # a stack is the thread name then module:function from the outermost to the innermost
+        ########################################
+        names = {thread.ident:thread.name for thread in threading.enumerate()}
+        frames = sys._current_frames()
+        with self.lock:
+            self.samples += 1
+            for ident,frame in frames.items():
+                if ident == me:
+                    continue
+                stack = []
+                # time.sleep() isn't a Python frame, seen from the line the innermost function is on
+                if 'sleep(' in linecache.getline(frame.f_code.co_filename,frame.f_lineno):
+                    stack.append('time:sleep')
+                while frame is not None:
+                    code = frame.f_code
+                    stack.append('%s:%s' % (os.path.splitext(os.path.basename(code.co_filename))[0],
+                                            getattr(code,'co_qualname',code.co_name)))
+                    frame = frame.f_back
+                stack.append(names.get(ident,'thread %d' % ident).replace(' ','_'))
+                self.stacks[';'.join(reversed(stack))] += 1
+
+    def summary(self) -> dict:
+        ########################################
+        # samples of each category, from the innermost function found in CATEGORIES
+        # output : {category:samples}, idle threads not counted
+        ########################################
+        categories = Counter()
+        with self.lock:
+            for stack,count in self.stacks.items():
+                functions = [function.split(':')[-1].split('.')[-1] for function in stack.split(';')[1:]]
+                if functions and functions[-1] in IDLE:
+                    continue
+                category = next((CATEGORIES[function] for function in reversed(functions) if function in CATEGORIES),'other')
+                categories[category] += count
+        return categories
+
+    def dump(self):
+        ########################################
+        # writes the collapsed stacks and shows where the time went
+        # the samples are kept, each dump has all of them since start
+        ########################################
+        with self.lock:
+            lines = ['%s %d' % (stack,count) for stack,count in sorted(self.stacks.items())]
+            samples = self.samples
+        try:
+            with open(self.filename,'w') as proffile:
+                proffile.write('\n'.join(lines) + '\n')
+        except OSError as msg:
+            print("Profile not written :",msg)
+            return
+        elapsed = perf_counter() - self.started
+        print("\nProfile : %d samples in %.0f s written to %s" % (samples,elapsed,self.filename))
+        categories = self.summary()
+        busy = sum(categories.values())
+        for category,count in categories.most_common():
+            print("  %-16s %5.1f %% of the busy samples" % (category,100 * count / busy))
+
+
+if __name__ == "__main__":
+  print ("%s" %(__Title))
+  print ("Version %s, date : %s" % (__Version, __VersionDate))
+  print ("This is a library, to be called from other modules. It does nothing by itself.")
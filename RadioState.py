@@ -0,0 +1,181 @@
+#-------------------------------------------------------------------------------
+# Name:        RadioState
+# Purpose:     The radio state, decoded from the CAT frames answered to the poll,
+#              sniffed, or sent by us, so local consumers don't need to query the radio
+#              typed fields, versioned snapshots, and subscriptions to the changes
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 radio state cache"
+__Version = "0.2"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import re
+import threading
+from time import time
+
+## readable modes from the Kenwood mode numbers, same names as KwdCat.ConvertMode
+MODES = {'1':'LSB','2':'USB','3':'CW','4':'FM','5':'AM','6':'FSK','7':'CW-R','9':'FSK-R'}
+MODENUMBERS = {mode:number for number,mode in MODES.items()}
+
+## frames decoded, e.g IF00014050380     +000000000020000000 or FA00014049680
+FRAMES = re.compile(r"(IF[0-9]{11}.{5}[+-][0-9]{18}|F[AB][0-9]{11}|MD[0-9]|F[RT][0-2]|PS[01]|RT[01]|XT[01]|SM0[0-9]{4}|RM[1-3][0-9]{4})(?=;)")
+## field of each RM meter
+RM_FIELDS = {'1':'swr', '2':'comp', '3':'alc'}
+
+## the fields, their type and value at start
+FIELDS = {
+    'power':(bool,False),
+    'freq_a':(int,0),           # VFO A frequency in Hz
+    'freq_b':(int,0),           # VFO B frequency in Hz
+    'mode':(str,''),            # LSB, USB, CW...
+    'vfo':(str,'A'),            # receive VFO
+    'txvfo':(str,'A'),          # transmit VFO
+    'split':(bool,False),
+    'tx':(bool,False),
+    'rit':(bool,False),
+    'xit':(bool,False),
+    'rit_offset':(int,0),       # RIT/XIT offset in Hz
+    'smeter':(int,0),           # S-meter (RX) or power meter (TX) 0-30
+    'swr':(int,0),              # RM meters 0-30
+    'comp':(int,0),
+    'alc':(int,0),
+}
+
+class RadioState(object):
+    """
+    class holding the last known radio state
+    fields are read as attributes, e.g state.mode, and only changed with update()
+    """
+    def __init__(self):
+        object.__setattr__(self,'lock',threading.RLock())
+        object.__setattr__(self,'fields',{name:default for name,(kind,default) in FIELDS.items()})
+        object.__setattr__(self,'version',0)            # goes up at each change
+        object.__setattr__(self,'updated',0.0)          # time of the last change
+        object.__setattr__(self,'subscribers',[])       # [(fields,callback)]
+
+    def __getattr__(self,name):
+        # only called for the fields, the other attributes are found before
+        if name in FIELDS:
+            return self.fields[name]
+        raise AttributeError("RadioState has no field '%s'" % name)
+
+    def __setattr__(self,name,value):
+        raise AttributeError("RadioState fields are changed with update(%s=...)" % name)
+
+    def update(self,**fields) -> dict:
+        ########################################
+        # changes some fields, e.g update(mode='CW',vfo='B')
+        # an unknown field or a wrong type raises an exception, so a typo can't go unnoticed
+        # the subscribers of the fields changed are called, in the order of the changes
+        # output : dict {field:(old value,new value)} of the fields really changed
+        ########################################
+        for name,value in fields.items():
+            if name not in FIELDS:
+                raise AttributeError("RadioState has no field '%s'" % name)
+            kind = FIELDS[name][0]
+            if not isinstance(value,kind) or (isinstance(value,bool) and kind is not bool):    # True is an int too
+                raise TypeError("RadioState field '%s' is %s, not %s" % (name,FIELDS[name][0].__name__,type(value).__name__))
+        with self.lock:                                 # held while notifying, so the changes are seen in order
+            changes = {name:(self.fields[name],value) for name,value in fields.items() if self.fields[name] != value}
+            if not changes:
+                return changes
+            self.fields.update(fields)
+            object.__setattr__(self,'version',self.version + 1)
+            object.__setattr__(self,'updated',time())
+            snapshot = self.get()
+            for names,callback in self.subscribers:
+                if not names.isdisjoint(changes):
+                    try:
+                        callback(changes,snapshot)
+                    except Exception as msg:
+                        print("RadioState subscriber error :",callback.__name__,msg)
+        return changes
+
+    def get(self) -> dict:
+        ########################################
+        # a consistent copy of all fields, with its version
+        ########################################
+        with self.lock:
+            snapshot = dict(self.fields)
+            snapshot['version'] = self.version
+            snapshot['updated'] = self.updated
+            return snapshot
+
+    def subscribe(self,fields,callback):
+        ########################################
+        # callback(changes,snapshot) is called when one of the fields changes
+        # e.g subscribe(('mode',),ModeLeds)
+        # it runs in the thread making the change, it must be short and must not wait for the radio
+        ########################################
+        unknown = set(fields) - set(FIELDS)
+        if unknown:
+            raise AttributeError("RadioState has no field %s" % ', '.join(sorted(unknown)))
+        self.subscribers.append((frozenset(fields),callback))
+
+    def decode(self,datas:str) -> bool:
+        ########################################
+        # updates the state from all the IF, FA, FB, MD, FR, FT, SM, RM frames found in datas
+        # the meter answers are decoded by whichever thread reads them, the meter or the sniffer
+        # input:str. Kenwood frames separated by ;, e.g what has been sniffed
+        # output:bool. True if something has been decoded
+        ########################################
+        fields = {}
+        vfos = False                                    # FR or FT seen, the split is computed
+        for frame in FRAMES.findall(datas or ''):
+            kind = frame[:2]
+            if kind == 'IF':
+                vfo = 'B' if frame[30] == '1' else 'A'
+                fields['vfo'] = vfo
+                fields['freq_' + vfo.lower()] = int(frame[2:13])
+                fields['rit_offset'] = int(frame[18:23])
+                fields['rit'] = frame[23] == '1'
+                fields['xit'] = frame[24] == '1'
+                fields['tx'] = frame[28] == '1'
+                if frame[29] in MODES:
+                    fields['mode'] = MODES[frame[29]]
+                fields['split'] = frame[32] == '1'
+                fields['txvfo'] = ('B' if vfo == 'A' else 'A') if fields['split'] else vfo
+            elif kind == 'FA':
+                fields['freq_a'] = int(frame[2:13])
+            elif kind == 'FB':
+                fields['freq_b'] = int(frame[2:13])
+            elif kind == 'MD' and frame[2] in MODES:
+                fields['mode'] = MODES[frame[2]]
+            elif kind == 'FR':                          # FR sets the transmit VFO as well
+                fields['vfo'] = fields['txvfo'] = 'B' if frame[2] == '1' else 'A'
+                vfos = True
+            elif kind == 'FT':
+                fields['txvfo'] = 'B' if frame[2] == '1' else 'A'
+                vfos = True
+            elif kind == 'PS':
+                fields['power'] = frame[2] == '1'
+            elif kind == 'RT':
+                fields['rit'] = frame[2] == '1'
+            elif kind == 'XT':
+                fields['xit'] = frame[2] == '1'
+            elif kind == 'SM':
+                fields['smeter'] = int(frame[3:7])
+            elif kind == 'RM':
+                fields[RM_FIELDS[frame[2]]] = int(frame[3:7])
+        if vfos:
+            fields['split'] = fields.get('txvfo',self.txvfo) != fields.get('vfo',self.vfo)
+        if fields:
+            fields['power'] = fields.get('power',True)      # it answers, it is ON
+            self.update(**fields)
+            if DEBUG:
+                print("RadioState :",fields)
+        return bool(fields)
+
+
+if __name__ == "__main__":
+  print ("%s" %(__Title))
+  print ("Version %s, date : %s" % (__Version, __VersionDate))
+  print ("This is a library, to be called from other modules. It does nothing by itself.")
@@ -0,0 +1,185 @@
+#-------------------------------------------------------------------------------
+# Name:        Recorder
+# Purpose:     Always-on capture of the MIDI and CAT traffic
+#              in a fixed size, memory mapped ring file
+#              and a tool to export or replay a time window of it
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 traffic recorder"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import os
+import sys
+import mmap
+import struct
+import argparse
+import threading
+from time import time, sleep, localtime, strftime
+
+## File layout, all little endian
+## header  : magic, record size, capacity (number of records), count (records written since creation)
+## records : timestamp (s since epoch), kind, length of data, data
+## the record n is at HEADER.size + (n % capacity) * RECORD.size
+## data longer than a record goes on in the next records, with CONTINUED set in kind
+MAGIC = b'M2TSREC1'
+HEADER = struct.Struct('<8sIIQ')
+RECORD = struct.Struct('<dBB54s')
+DATASIZE = 54
+
+## kinds of records
+MIDI_IN = 1         # data = MIDI status, data1, data2, data3, MIDI timestamp in ms (uint32)
+CAT_TX = 2          # data = CAT command(s) sent to the radio
+CAT_RX = 3          # data = bytes received from the radio
+CONTINUED = 0x80
+KINDS = {MIDI_IN:'MIDI', CAT_TX:'CAT>', CAT_RX:'CAT<'}
+
+MIDI_EVENT = struct.Struct('<BBBBI')
+
+class Recorder(object):
+    """
+    class writing timestamped records in a memory mapped ring file
+    """
+    def __init__(self,filename='midi2ts590.rec',capacity=65536):
+        # opens the ring file, creates it if it doesn't exist or has another size
+        # capacity : number of records, 64 bytes each
+        self.filename = filename
+        self.capacity = capacity
+        self.lock = threading.Lock()
+        size = HEADER.size + capacity * RECORD.size
+        reuse = False
+        if os.path.isfile(filename) and os.path.getsize(filename) == size:
+            with open(filename,'rb') as f:
+                magic, recsize, cap, count = HEADER.unpack(f.read(HEADER.size))
+            reuse = magic == MAGIC and recsize == RECORD.size and cap == capacity
+        if not reuse:
+            with open(filename,'wb') as f:
+                f.truncate(size)
+        self.file = open(filename,'r+b')
+        self.map = mmap.mmap(self.file.fileno(),size)
+        if reuse:
+            self.count = HEADER.unpack_from(self.map,0)[3]  # go on after the last run
+        else:
+            self.count = 0
+            HEADER.pack_into(self.map,0,MAGIC,RECORD.size,capacity,0)
+
+    def record(self,kind:int,data:bytes):
+        ########################################
+        # adds a record, timestamped now
+        # input : kind MIDI_IN, CAT_TX or CAT_RX
+        #         data : bytes
+        ########################################
+        now = time()
+        with self.lock:
+            for start in range(0,max(len(data),1),DATASIZE):
+                chunk = data[start:start + DATASIZE]
+                offset = HEADER.size + (self.count % self.capacity) * RECORD.size
+                RECORD.pack_into(self.map,offset,now,kind if start == 0 else kind | CONTINUED,len(chunk),chunk)
+                self.count += 1
+            struct.pack_into('<Q',self.map,HEADER.size - 8,self.count)
+
+    def midi(self,status:int,data1:int,data2:int,data3:int,timestamp:int):
+        # records a MIDI event as read by pygame
+        self.record(MIDI_IN,MIDI_EVENT.pack(status,data1,data2,data3,timestamp & 0xFFFFFFFF))
+
+    def close(self):
+        self.map.flush()
+        self.map.close()
+        self.file.close()
+
+
+def ReadRecords(filename:str):
+########################################
+# reads a ring file, oldest record first
+# returns a list of [timestamp,kind,data] with continued data joined
+########################################
+    with open(filename,'rb') as f:
+        buffer = f.read()
+    magic, recsize, capacity, count = HEADER.unpack_from(buffer,0)
+    if magic != MAGIC or recsize != RECORD.size:
+        print(filename,"is not a midi2ts590 record file")
+        return []
+    records = []
+    for n in range(max(0,count - capacity),count):
+        timestamp, kind, length, data = RECORD.unpack_from(buffer,HEADER.size + (n % capacity) * RECORD.size)
+        if kind & CONTINUED:
+            if records and records[-1][1] == kind & ~CONTINUED:
+                records[-1][2] += data[:length]
+            continue                                    # a continuation without its start has been overwritten
+        records.append([timestamp,kind,data[:length]])
+    return records
+
+def FormatRecord(record:list) -> str:
+# one readable line per record
+    timestamp, kind, data = record
+    when = strftime('%Y-%m-%d %H:%M:%S',localtime(timestamp)) + '.%03d' % int(timestamp % 1 * 1000)
+    if kind == MIDI_IN:
+        status, data1, data2, data3, miditime = MIDI_EVENT.unpack(data)
+        text = 'Device:%d Status:%d Control:%d Value:%d Time:%d' % (status, data1, data2, data3, miditime)
+    else:
+        text = data.decode(errors='replace')
+    return '%s %s %s' % (when, KINDS.get(kind,'?'), text)
+
+def ParseTime(text:str) -> float:
+# accepts seconds since epoch or YYYY-MM-DD HH:MM:SS
+    try:
+        return float(text)
+    except ValueError:
+        from time import mktime, strptime
+        return mktime(strptime(text,'%Y-%m-%d %H:%M:%S'))
+
+
+if __name__ == "__main__":
+    print ("%s" %(__Title))
+    print ("Version %s, date : %s\n" % (__Version, __VersionDate))
+
+    parser = argparse.ArgumentParser(description="export or replay a time window of a midi2ts590 record file")
+    parser.add_argument("action", choices=['export','replay'], help="export prints the records, replay plays them back with their timing")
+    parser.add_argument("file", nargs='?', default='midi2ts590.rec', help="record file")
+    parser.add_argument("--start", help="start of window, YYYY-MM-DD HH:MM:SS or seconds since epoch")
+    parser.add_argument("--end", help="end of window, same format")
+    parser.add_argument("--last", type=float, help="only the last LAST seconds of the file")
+    parser.add_argument("--port", help="replay: send the CAT commands to this COM port, e.g a radio or an emulator")
+    parser.add_argument("--baudrate", type=int, default=57600, help="replay: baudrate of the COM port")
+    parser.add_argument("--speed", type=float, default=1.0, help="replay: speed factor")
+    args = parser.parse_args()
+
+    records = ReadRecords(args.file)
+    if records:
+        start = ParseTime(args.start) if args.start else records[0][0]
+        end = ParseTime(args.end) if args.end else records[-1][0]
+        if args.last:
+            start = max(start,records[-1][0] - args.last)
+        records = [record for record in records if start <= record[0] <= end]
+
+    if args.action == 'export':
+        for record in records:
+            print(FormatRecord(record))
+
+    elif args.action == 'replay' and records:
+        radio = None
+        if args.port:
+            from KwdCat import KwdCat
+            radio = KwdCat()
+            if not radio.open_port(port=args.port,baudrate=args.baudrate):
+                sys.exit(1)
+        first = records[0][0]
+        origin = time()
+        for record in records:
+            delay = origin + (record[0] - first) / args.speed - time()
+            if delay > 0:
+                sleep(delay)
+            print(FormatRecord(record))
+            if radio and record[1] == CAT_TX:
+                radio.send(record[2].decode(errors='replace'))
+        if radio:
+            radio.close_port()
+    print(len(records),"records")
@@ -0,0 +1,202 @@
+#-------------------------------------------------------------------------------
+# Name:        RigServer
+# Purpose:     A hamlib rigctld compatible TCP server
+#              get commands are answered from the RadioState cache,
+#              set commands go to the radio through the same KwdCat as the controller
+#              so several programs can share the radio without their own COM port
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 rigctld server"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import threading
+import socketserver
+from time import sleep
+from Metrics import metrics
+from RadioState import MODENUMBERS
+
+## hamlib mode names from our readable modes, and back
+HAMLIB_MODES = {'LSB':'LSB','USB':'USB','CW':'CW','FM':'FM','AM':'AM','FSK':'RTTY','CW-R':'CWR','FSK-R':'RTTYR'}
+RADIO_MODES = {hamlib:mode for mode,hamlib in HAMLIB_MODES.items()}
+
+## hamlib error codes
+RIG_OK = 0
+RIG_EINVAL = -1
+RIG_ENIMPL = -4
+
+## answer to \dump_state, protocol 0, a TS-590 like rig
+## modes AM|CW|USB|LSB|RTTY|FM|CWR|RTTYR = 0x1bf, VFO A|B = 0x3
+DUMP_STATE = '\n'.join([
+    '0',                                                    # protocol version
+    '2',                                                    # rig model NET rigctl
+    '2',                                                    # ITU region
+    '30000.000000 60000000.000000 0x1bf -1 -1 0x3 0x1',     # RX range
+    '0 0 0 0 0 0 0',
+    '1800000.000000 54000000.000000 0x1bf 5000 100000 0x3 0x1',   # TX range
+    '0 0 0 0 0 0 0',
+    '0x1bf 1',                                              # tuning steps
+    '0x1bf 10',
+    '0 0',
+    '0xc 2400',                                             # filters
+    '0x82 500',
+    '0x110 500',
+    '0x1 6000',
+    '0x20 12000',
+    '0 0',
+    '9999',                                                 # max RIT
+    '9999',                                                 # max XIT
+    '0',                                                    # max IF shift
+    '0',                                                    # announces
+    '0 ',                                                   # preamps
+    '0 ',                                                   # attenuators
+    '0x0',                                                  # get functions
+    '0x0',                                                  # set functions
+    '0x0',                                                  # get levels
+    '0x0',                                                  # set levels
+    '0x0',                                                  # get parms
+    '0x0',                                                  # set parms
+]) + '\n'
+
+class RigServer(object):
+    """
+    class serving the rigctld protocol on localhost
+    """
+    def __init__(self,radio,state,port=4532,refresh=0.5):
+        # radio : an opened KwdCat
+        # state : the RadioState cache
+        # refresh : the cache is refreshed every refresh s with one pipelined read, 0 = fed by the poll/sniff only
+        self.radio = radio
+        self.state = state
+        self.port = port
+        self.refresh = refresh
+        self.running = False
+        self.clients = 0
+        metrics.gauge('rigctl_clients',lambda: self.clients)
+
+    def start(self):
+        server = self
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                server.clients += 1
+                try:
+                    for line in self.rfile:
+                        line = line.decode(errors='ignore').strip()
+                        if not line:
+                            continue
+                        answer = server.command(line)
+                        if answer is None:                  # quit
+                            break
+                        self.wfile.write(answer.encode())
+                except OSError:
+                    pass
+                finally:
+                    server.clients -= 1
+
+        socketserver.ThreadingTCPServer.allow_reuse_address = True
+        self.server = socketserver.ThreadingTCPServer(('127.0.0.1',self.port),Handler)
+        self.server.daemon_threads = True
+        self.running = True
+        threading.Thread(target=self.server.serve_forever, daemon=True, name='Rig server').start()
+        if self.refresh:
+            threading.Thread(target=self.refresher, daemon=True, name='Rig server refresh').start()
+
+    def stop(self):
+        self.running = False
+        self.server.shutdown()
+        self.server.server_close()
+
+    def refresher(self):
+        ########################################
+        # keeps the cache fresh, one pipelined read for all clients
+        ########################################
+        while self.running:
+            answers = self.radio.pipeline(['IF','FA','FB'],timeout=0.2)
+            if answers:
+                self.state.decode(';'.join(answers.values()) + ';')
+            sleep(self.refresh)
+
+    def set(self,cmd:str,**fields) -> str:
+        # sends a set command to the radio and updates the cache
+        self.radio.query(cmd,0)
+        self.state.update(**fields)
+        return 'RPRT %d\n' % RIG_OK
+
+    def command(self,line:str) -> str:
+        ########################################
+        # executes one rigctl command line
+        # returns the answer, None to close the connection
+        ########################################
+        metrics.inc('rigctl_commands')
+        if DEBUG:
+            print("rigctl :",line)
+        words = line.split()
+        cmd = words[0]
+        args = words[1:]
+        state = self.state.get()
+        try:
+            if cmd in ('q','Q','\\quit'):
+                return None
+            if cmd == '\\dump_state':
+                return DUMP_STATE
+            if cmd == '\\chk_vfo':
+                return '0\n'
+            if cmd == '\\get_powerstat':                # 0 off, 1 on : radio ON as last seen and its port open
+                return '%d\n' % (state['power'] and self.radio.connected)
+            if cmd in ('f','\\get_freq'):
+                return '%d\n' % state['freq_' + state['vfo'].lower()]
+            if cmd in ('F','\\set_freq'):
+                freq = int(float(args[0]))
+                vfo = state['vfo']
+                return self.set('F%s%011d' % (vfo,freq),**{'freq_' + vfo.lower():freq})
+            if cmd in ('i','\\get_split_freq'):
+                return '%d\n' % state['freq_' + state['txvfo'].lower()]
+            if cmd in ('I','\\set_split_freq'):
+                freq = int(float(args[0]))
+                vfo = state['txvfo']
+                return self.set('F%s%011d' % (vfo,freq),**{'freq_' + vfo.lower():freq})
+            if cmd in ('m','\\get_mode'):
+                return '%s\n0\n' % HAMLIB_MODES.get(state['mode'],'USB')
+            if cmd in ('M','\\set_mode'):
+                mode = RADIO_MODES.get(args[0])
+                if mode is None:
+                    return 'RPRT %d\n' % RIG_EINVAL
+                return self.set('MD' + MODENUMBERS[mode],mode=mode)
+            if cmd in ('v','\\get_vfo'):
+                return 'VFO%s\n' % state['vfo']
+            if cmd in ('V','\\set_vfo'):
+                if args[0] not in ('VFOA','VFOB'):
+                    return 'RPRT %d\n' % RIG_EINVAL
+                vfo = args[0][3]
+                number = '0' if vfo == 'A' else '1'
+                return self.set('FR%s;FT%s' % (number,number),vfo=vfo,txvfo=vfo,split=False)
+            if cmd in ('s','\\get_split_vfo'):
+                return '%d\nVFO%s\n' % (state['split'],state['txvfo'])
+            if cmd in ('S','\\set_split_vfo'):
+                split = args[0] == '1'
+                txvfo = args[1][3] if split and len(args) > 1 and args[1] in ('VFOA','VFOB') else state['vfo']
+                if split and txvfo == state['vfo']:             # split on the same VFO, use the other one
+                    txvfo = 'B' if state['vfo'] == 'A' else 'A'
+                return self.set('FT%s' % ('0' if txvfo == 'A' else '1'),txvfo=txvfo,split=split)
+            if cmd in ('t','\\get_ptt'):
+                return '%d\n' % state['tx']
+            if cmd in ('T','\\set_ptt'):
+                ptt = args[0] != '0'
+                return self.set('TX' if ptt else 'RX',tx=ptt)
+            return 'RPRT %d\n' % RIG_ENIMPL
+        except (IndexError, ValueError):
+            return 'RPRT %d\n' % RIG_EINVAL
+
+
+if __name__ == "__main__":
+  print ("%s" %(__Title))
+  print ("Version %s, date : %s" % (__Version, __VersionDate))
+  print ("This is a library, to be called from other modules. It does nothing by itself.")
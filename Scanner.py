@@ -0,0 +1,143 @@
+#-------------------------------------------------------------------------------
+# Name:        Scanner
+# Purpose:     Frequency scanning driven from the controller
+#              steps VFO A through a range or a list of channels
+#              each step is one single write : the S-meter read of the current
+#              channel followed by the FA command of the next one
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 scanner"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import threading
+from time import sleep, perf_counter
+from Metrics import metrics
+
+class Scanner(object):
+    """
+    class scanning VFO A until a signal is found
+    """
+    def __init__(self,radio,channels:list,dwell=0.05,threshold=10):
+        # radio : an opened KwdCat
+        # channels : list of frequencies in Hz
+        # dwell : time on each channel in s, for the S-meter to settle
+        # threshold : S-meter value 0-30 stopping the scan
+        self.radio = radio
+        self.channels = channels
+        self.dwell = dwell
+        self.threshold = threshold
+        self.running = False
+        self.index = 0                  # next channel to scan
+        self.rate = 0.0                 # channels per second measured
+        self.found = None               # frequency where the scan stopped on a signal
+        self.thread = None
+        self.done = None                # called when the scan stops, whatever stopped it
+        metrics.gauge('scan_channels_per_second',lambda: round(self.rate,1))
+
+    def start(self,done=None):
+        # done : called when the scan stops, e.g to switch the pad LED off
+        if self.running or not self.channels:
+            return
+        if self.thread and self.thread.is_alive():      # the last scan is still ending
+            self.thread.join(1)
+            if self.thread.is_alive():
+                return
+        self.done = done
+        self.running = True
+        self.found = None
+        self.thread = threading.Thread(target=self.run, daemon=True, name='Scanner')
+        self.thread.start()
+
+    def stop(self):
+        self.running = False
+
+    def toggle(self,done=None) -> bool:
+        # start/stop from a pad, returns True if now scanning
+        if self.running:
+            self.stop()
+        else:
+            self.start(done)
+        return self.running
+
+    def speed(self,faster:bool):
+        ########################################
+        # changes the dwell time by 20%, from the jog
+        # 0 is allowed : the scan then goes as fast as the radio answers
+        ########################################
+        if faster:
+            self.dwell = self.dwell / 1.2 if self.dwell > 0.002 else 0
+        else:
+            self.dwell = max(self.dwell * 1.2,0.002)
+        print("Scan dwell %.0f ms" % (self.dwell * 1000))
+
+    def run(self):
+        ########################################
+        # scanning loop
+        # the FA of the first channel is sent alone, then each write reads
+        # the S-meter of the current channel and tunes the next one
+        ########################################
+        current = self.channels[self.index % len(self.channels)]
+        self.radio.send('FA%011d;' % current)
+        stepstart = perf_counter()
+        counted = 0
+        ratestart = perf_counter()
+        while self.running:
+            delay = self.dwell - (perf_counter() - stepstart)
+            if delay > 0:
+                sleep(delay)
+            nextindex = (self.index + 1) % len(self.channels)
+            answers = self.radio.pipeline(['SM0'],timeout=0.1,then='FA%011d' % self.channels[nextindex])
+            if answers is None:                         # gave way to a control command, try again
+                sleep(0.001)
+                continue
+            stepstart = perf_counter()
+            smeter = self.radio.ReadCmdSM(answers.get('SM0'))
+            if smeter is not None and smeter >= self.threshold:
+                self.running = False
+                self.found = current
+                self.radio.send('FA%011d;' % current)   # go back to the channel with a signal
+                print("Scan stopped on %.5f MHz, S-meter %d" % (current / 1e6,smeter))
+                break
+            self.index = nextindex
+            current = self.channels[nextindex]
+            counted += 1
+            metrics.inc('scan_channels')
+            elapsed = perf_counter() - ratestart
+            if elapsed >= 1:                            # channels per second, measured each second
+                self.rate = counted / elapsed
+                counted = 0
+                ratestart = perf_counter()
+                if DEBUG:
+                    print("Scanning %.1f channels/s" % self.rate)
+        if self.found is None:
+            print("Scan stopped, %.1f channels/s" % self.rate)
+        if self.done:
+            self.done()
+
+
+def MakeChannels(start:float,stop:float,step:float,channels='') -> list:
+########################################
+# list of channels in Hz
+# input : start, stop, step in kHz, or channels a list of kHz separated by commas
+########################################
+    if channels.strip():
+        return [round(float(channel) * 1000) for channel in channels.split(',') if channel.strip()]
+    hz = round(step * 1000)                     # a step under 1 Hz is 0, no channel
+    if hz <= 0 or stop < start:
+        return []
+    return list(range(round(start * 1000),round(stop * 1000) + 1,hz))
+
+
+if __name__ == "__main__":
+  print ("%s" %(__Title))
+  print ("Version %s, date : %s" % (__Version, __VersionDate))
+  print ("This is a library, to be called from other modules. It does nothing by itself.")
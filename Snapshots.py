@@ -0,0 +1,99 @@
+#-------------------------------------------------------------------------------
+# Name:        Snapshots
+# Purpose:     Store and recall complete radio setups
+#              a snapshot is read with one pipelined read and restored
+#              with one single CAT write, checked with one IF query
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 radio snapshots"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import configparser
+
+## what is read to make a snapshot
+## the answers of these reads are also the commands setting them back
+SNAPSHOT_READS = ['FR','FT','FA','FB','MD','FW','SH','SL','IS','PC','RG','AG0','RT','XT']
+
+class Snapshots(object):
+    """
+    class handling the radio snapshots, kept in an ini like file
+    """
+    def __init__(self,radio,filename='midi2ts590.snp'):
+        # radio : an opened KwdCat
+        self.radio = radio
+        self.filename = filename
+        self.slots = configparser.ConfigParser()
+        self.slots.optionxform = str            # keep the commands upper case
+        self.slots.read(filename)
+
+    def read_state(self) -> dict:
+        ########################################
+        # reads the radio state with a single pipelined read
+        # the reads not answered (taken by the sniffer, flushed by a query...) are asked once more
+        # output : dict {command:set command} e.g {'MD':'MD2'}, only with what the radio answered
+        ########################################
+        answers = self.radio.pipeline(SNAPSHOT_READS,timeout=0.3,wait=True) or {}
+        missing = [request for request in SNAPSHOT_READS if request not in answers]
+        if missing and answers:
+            answers.update(self.radio.pipeline(missing,timeout=0.3,wait=True) or {})
+        return {request[:2]:answers[request] for request in SNAPSHOT_READS if request in answers}
+
+    def store(self,slot:str) -> bool:
+        ########################################
+        # stores the current radio state in a slot and saves the file
+        ########################################
+        state = self.read_state()
+        if not state:
+            print("Snapshot",slot,"not stored, no answer from radio")
+            return False
+        missing = [request[:2] for request in SNAPSHOT_READS if request[:2] not in state]
+        if missing:                             # a partial snapshot would recall a mix of old and new settings
+            print("Snapshot",slot,"not stored, no answer from radio for",','.join(missing))
+            return False
+        self.slots[slot] = state
+        with open(self.filename,'w') as snpfile:
+            self.slots.write(snpfile)
+        print("Snapshot",slot,"stored :",';'.join(state.values()))
+        return True
+
+    def recall(self,slot:str) -> str:
+        ########################################
+        # restores a slot with one CAT write, then checks it with one IF query
+        # output : the IF frame read after the restore, None if it failed
+        ########################################
+        if not self.slots.has_section(slot):
+            print("Snapshot",slot,"is empty, hold the pad 1 s to store it")
+            return None
+        state = dict(self.slots[slot])
+        self.radio.send(';'.join(state.values()) + ';')         # one write for all
+        answerIF = self.radio.query('IF',37)
+        decoded = self.radio.ReadCmdIF(answerIF)
+        if decoded is None:
+            print("Snapshot",slot,"recalled, no answer from radio to check it")
+            return None
+        # IFfreq,IFRitFreq,IFRitOnOff,IFXitOnOff,IFRxTx,IFMode,IFVfo,IFSplit
+        expected = {'MD':'MD' + decoded[5], 'FR':'FR' + decoded[6], 'RT':'RT' + decoded[2], 'XT':'XT' + decoded[3]}
+        wrong = [state[prefix] for prefix in expected if prefix in state and state[prefix] != expected[prefix]]
+        vfo = 'FA' if decoded[6] == '0' else 'FB'
+        if vfo in state and state[vfo][2:] != answerIF[2:13]:
+            wrong.append(state[vfo])
+        if wrong:
+            print("Snapshot",slot,"recalled, but not applied :",';'.join(wrong))
+        else:
+            print("Snapshot",slot,"recalled")
+        return answerIF
+
+
+if __name__ == "__main__":
+  print ("%s" %(__Title))
+  print ("Version %s, date : %s" % (__Version, __VersionDate))
+  print ("This is a library, to be called from other modules. It does nothing by itself.")
@@ -0,0 +1,138 @@
+#-------------------------------------------------------------------------------
+# Name:        SpotMap
+# Purpose:     The spots of a band map file exported by the logging software
+#              kept sorted by frequency, the nearest one is found by bisection
+#              the file is read again when it changes, only the new lines if it has grown
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 spot map"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import os
+import heapq
+import hashlib
+import bisect
+import threading
+from time import sleep
+from Metrics import metrics
+
+## Spot file, one spot per line : frequency in kHz, call, comment
+##   14025.0 DL1ABC CQ TEST
+##   14025.0,DL1ABC,CQ TEST
+## lines starting with # are comments
+def ParseSpots(text:str) -> list:
+########################################
+# spots of the complete lines of text
+# output : list of (frequency in Hz, call, comment) sorted by frequency, wrong lines ignored
+########################################
+    spots = []
+    for line in text.splitlines():
+        line = line.strip()
+        if not line or line.startswith('#'):
+            continue
+        fields = [field.strip() for field in line.split(',')] if ',' in line else line.split(None,2)
+        try:
+            spots.append((round(float(fields[0]) * 1000),fields[1] if len(fields) > 1 else '',
+                          fields[2] if len(fields) > 2 else ''))
+        except ValueError:
+            if DEBUG:
+                print("Spot line ignored :",line)
+    spots.sort()
+    return spots
+
+
+class SpotMap(object):
+    """
+    class holding the spots sorted by frequency
+    """
+    def __init__(self,filename,window=500):
+        # filename : spot file
+        # window : max distance in Hz to the nearest spot
+        self.filename = filename
+        self.window = window
+        self.freqs = []                 # sorted frequencies, bisected
+        self.spots = []                 # (frequency,call,comment) in the same order
+        self.offset = 0                 # bytes of the file already read
+        self.digest = None              # hash of the bytes already read
+        self.mtime = None
+        self.running = False
+
+    def __len__(self):
+        return len(self.freqs)
+
+    def load(self) -> int:
+        ########################################
+        # reads the file if it has changed since the last time
+        # only the lines added if it has grown, all of it if it has been rewritten
+        # output : number of spots read, 0 if nothing has changed or no file
+        ########################################
+        try:
+            info = os.stat(self.filename)
+            if info.st_mtime == self.mtime and info.st_size == self.offset:
+                return 0
+            with open(self.filename,'rb') as spotfile:
+                data = spotfile.read()
+        except OSError as msg:
+            if DEBUG:
+                print("Spot file not read :",msg)
+            return 0
+        # grown only if all the bytes already read are still there, else a rewritten file is read from 0
+        grown = len(data) >= self.offset and hashlib.sha1(data[:self.offset]).digest() == self.digest
+        start = self.offset if grown else 0
+        end = data.rfind(b'\n') + 1                 # complete lines only, the rest next time
+        new = ParseSpots(data[start:end].decode(errors='ignore'))
+        if grown:                                   # merged with the spots already there
+            merged = list(heapq.merge(self.spots,new))
+        else:
+            merged = new
+        # a new pair of lists, the lookups in progress go on with the old ones
+        self.freqs, self.spots = [spot[0] for spot in merged], merged
+        self.offset = max(end,start)
+        self.digest = hashlib.sha1(data[:self.offset]).digest()
+        self.mtime = info.st_mtime
+        metrics.inc('spots_read',len(new))
+        if DEBUG:
+            print("Spots : %d read, %d in all" % (len(new),len(merged)))
+        return len(new)
+
+    def nearest(self,freq:int) -> tuple:
+        ########################################
+        # the spot nearest to freq (Hz), by bisection
+        # output : (frequency,call,comment) or None if none within window
+        ########################################
+        freqs, spots = self.freqs, self.spots
+        index = bisect.bisect_left(freqs,freq)
+        best = None
+        for candidate in (index - 1,index):
+            if 0 <= candidate < len(freqs) and abs(freqs[candidate] - freq) <= self.window:
+                if best is None or abs(freqs[candidate] - freq) < abs(freqs[best] - freq):
+                    best = candidate
+        return None if best is None else spots[best]
+
+    def watch(self,period=2.0):
+        # starts a thread reading the file again when it changes
+        self.running = True
+        threading.Thread(target=self.watcher, args=(period,), daemon=True, name='Spot map').start()
+
+    def watcher(self,period:float):
+        while self.running:
+            sleep(period)
+            try:
+                self.load()
+            except Exception as msg:
+                print("Exception in SpotMap watcher :",msg)
+
+
+if __name__ == "__main__":
+  print ("%s" %(__Title))
+  print ("Version %s, date : %s" % (__Version, __VersionDate))
+  print ("This is a library, to be called from other modules. It does nothing by itself.")
@@ -0,0 +1,140 @@
+#-------------------------------------------------------------------------------
+# Name:        StatusBlock
+# Purpose:     Publishes the radio state in a small memory mapped file
+#              any number of local programs can read it, it costs the radio nothing
+#              readers get consistent snapshots with a sequence lock
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 radio status block"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import os
+import mmap
+import struct
+import argparse
+import threading
+from time import time, sleep
+
+## File layout, all little endian, 128 bytes
+## header : magic, layout version, sequence
+## status : state version, time of the update (s since epoch), VFO A & B frequencies in Hz,
+##          mode, receive VFO, transmit VFO, power, split, TX, RIT, XIT,
+##          RIT/XIT offset in Hz, S-meter or power meter 0-30, SWR, COMP, ALC 0-30
+##
+## sequence lock : the writer makes the sequence odd, writes the status, makes it even again
+## a reader reads the sequence, the status, the sequence again, and retries if
+## the sequence was odd or has changed : the status it got is then consistent
+MAGIC = b'M2TSSTS1'
+LAYOUT = 1
+HEADER = struct.Struct('<8sIxxxxQ')
+SEQUENCE = struct.Struct('<Q')
+SEQUENCE_OFFSET = 16
+STATUS = struct.Struct('<QdQQ8sccBBBBBiHHHH')
+SIZE = 128
+FIELDS = ('version','updated','freq_a','freq_b','mode','vfo','txvfo','power','split','tx','rit','xit',
+          'rit_offset','smeter','swr','comp','alc')
+
+class StatusBlock(object):
+    """
+    class writing the radio state in the status file
+    """
+    def __init__(self,filename='midi2ts590.sts'):
+        self.filename = filename
+        self.lock = threading.Lock()            # one writer at a time
+        with open(filename,'wb') as f:
+            f.truncate(SIZE)
+        self.file = open(filename,'r+b')
+        self.map = mmap.mmap(self.file.fileno(),SIZE)
+        self.sequence = 0
+        HEADER.pack_into(self.map,0,MAGIC,LAYOUT,self.sequence)
+
+    def publish(self,changes:dict,state:dict):
+        ########################################
+        # writes a RadioState snapshot, to be subscribed to all the RadioState fields
+        ########################################
+        with self.lock:
+            self.sequence += 1                  # odd, writing
+            SEQUENCE.pack_into(self.map,SEQUENCE_OFFSET,self.sequence)
+            STATUS.pack_into(self.map,HEADER.size,
+                             state['version'],state['updated'],state['freq_a'],state['freq_b'],
+                             state['mode'].encode(),state['vfo'].encode(),state['txvfo'].encode(),
+                             state['power'],state['split'],state['tx'],state['rit'],state['xit'],
+                             state['rit_offset'],state['smeter'],state['swr'],state['comp'],state['alc'])
+            self.sequence += 1                  # even, done
+            SEQUENCE.pack_into(self.map,SEQUENCE_OFFSET,self.sequence)
+
+    def close(self):
+        # the magic is cleared, the readers don't take the last state for a live one
+        with self.lock:
+            self.map[0:len(MAGIC)] = bytes(len(MAGIC))
+        self.map.close()
+        self.file.close()
+
+
+def ReadStatus(filename='midi2ts590.sts',retries=1000) -> dict:
+########################################
+# reads a consistent snapshot of the status file, for the local programs
+# output : dict of FIELDS plus the sequence, None if the file isn't a status file or midi2ts590 stopped
+########################################
+    with open(filename,'rb') as f:
+        with mmap.mmap(f.fileno(),SIZE,access=mmap.ACCESS_READ) as status:
+            magic, layout, sequence = HEADER.unpack_from(status,0)
+            if magic != MAGIC or layout != LAYOUT:
+                return None
+            for retry in range(retries):
+                before = SEQUENCE.unpack_from(status,SEQUENCE_OFFSET)[0]
+                if before & 1:                  # being written, let the writer finish
+                    sleep(0)
+                    continue
+                values = STATUS.unpack_from(status,HEADER.size)
+                if SEQUENCE.unpack_from(status,SEQUENCE_OFFSET)[0] == before:
+                    snapshot = dict(zip(FIELDS,values))
+                    for name in ('mode','vfo','txvfo'):
+                        snapshot[name] = snapshot[name].rstrip(b'\0').decode()
+                    for name in ('power','split','tx','rit','xit'):
+                        snapshot[name] = bool(snapshot[name])
+                    snapshot['sequence'] = before
+                    return snapshot
+                sleep(0)
+    return None
+
+
+if __name__ == "__main__":
+    print ("%s" %(__Title))
+    print ("Version %s, date : %s\n" % (__Version, __VersionDate))
+
+    parser = argparse.ArgumentParser(description="shows the radio status published by midi2ts590")
+    parser.add_argument("file", nargs='?', default='midi2ts590.sts', help="status file")
+    parser.add_argument("-w","--watch", action="store_true", help="shows each change until CTRL-C")
+    args = parser.parse_args()
+
+    if not os.path.isfile(args.file):
+        print(args.file,"not found, set status = 1 in midi2ts590.ini")
+        raise SystemExit(1)
+    last = None
+    try:
+        while True:
+            snapshot = ReadStatus(args.file)
+            if snapshot is None:
+                print(args.file,"is not a status file or midi2ts590 stopped")
+                break
+            if snapshot['sequence'] != last:
+                last = snapshot['sequence']
+                print("%.5f/%.5f MHz %-5s VFO %s/%s split %d TX %d RIT %d XIT %d %+d Hz S %2d  age %.3f s" % (
+                    snapshot['freq_a'] / 1e6,snapshot['freq_b'] / 1e6,snapshot['mode'],snapshot['vfo'],snapshot['txvfo'],
+                    snapshot['split'],snapshot['tx'],snapshot['rit'],snapshot['xit'],snapshot['rit_offset'],
+                    snapshot['smeter'],time() - snapshot['updated']))
+            if not args.watch:
+                break
+            sleep(0.01)
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,202 @@
+#-------------------------------------------------------------------------------
+# Name:        Tracker
+# Purpose:     Dual VFO tracking for satellites and EME
+#              VFO A and B move together with a fixed offset (lockstep),
+#              or follow a Doppler curve read from a file
+#              the FA/FB are computed and sent at a fixed rate, only when they change
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 VFO tracker"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+
+## flag to be a bit verbose
+DEBUG = False
+
+## Imports
+import bisect
+import threading
+from datetime import datetime, timezone
+from time import time, sleep, perf_counter
+from Metrics import metrics
+
+## Doppler file, one point per line : UTC time, VFO A (RX) and VFO B (TX) frequencies in Hz
+##   2026-10-19 18:00:00  145800000  437800000
+##   1792432800,145800000,437800000             (time in s since epoch)
+## lines starting with # are comments, the frequencies between 2 points are interpolated
+
+def ParseTime(text:str) -> float:
+# s since epoch from a number, or an ISO UTC date and time
+    try:
+        return float(text)
+    except ValueError:
+        return datetime.fromisoformat(text).replace(tzinfo=timezone.utc).timestamp()
+
+def LoadDoppler(filename:str) -> tuple:
+########################################
+# reads a Doppler file
+# output : (times, rx, tx) lists sorted by time
+# raises OSError if the file can't be read, ValueError on a wrong line
+########################################
+    points = []
+    with open(filename) as dopfile:
+        for number,line in enumerate(dopfile,1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            fields = line.split(',') if ',' in line else line.split()
+            if len(fields) < 3:
+                raise ValueError("line %d, time rx tx expected" % number)
+            try:
+                points.append((ParseTime(' '.join(fields[:-2]).strip()),float(fields[-2]),float(fields[-1])))
+            except ValueError:
+                raise ValueError("line %d, wrong time or frequency" % number)
+    if len(points) < 2:
+        raise ValueError("at least 2 points are needed")
+    points.sort()
+    return [point[0] for point in points], [point[1] for point in points], [point[2] for point in points]
+
+
+class Tracker(object):
+    """
+    class moving VFO A and B together, or along a Doppler curve
+    """
+    def __init__(self,radio,state,rate=10,offset=None,filename='',resolution=10,txfollow=1):
+        # radio : an opened KwdCat, the FA/FB go through its writer thread with the pots
+        # state : the RadioState, VFO A & B frequencies at start, updated with what is sent
+        # rate : updates per second
+        # offset : VFO B - VFO A in Hz for the lockstep, None keeps the one at start
+        # filename : Doppler file, '' for the lockstep
+        # resolution : frequencies rounded to this, in Hz, nothing is sent if the rounded value is the same
+        # txfollow : VFO B moves with the manual offset 1 same way, -1 the other way (inverting transponder), 0 not
+        self.radio = radio
+        self.state = state
+        self.rate = rate
+        self.wanted_offset = offset
+        self.offset = 0
+        self.filename = filename
+        self.resolution = max(resolution,1)
+        self.txfollow = txfollow
+        self.curve = None
+        self.base = 0                   # VFO A at start, lockstep
+        self.manual = 0                 # offset added with JOG A, in Hz
+        self.running = False
+        self.thread = None
+        self.done = None
+        self.sent = 0
+
+    def start(self,done=None) -> bool:
+        ########################################
+        # starts tracking, the Doppler file is read again so it can be updated between passes
+        # done : called when the tracking stops, e.g to switch the pad LED off
+        ########################################
+        if self.running:
+            return True
+        if self.thread and self.thread.is_alive():
+            self.thread.join(1)
+        if self.filename:
+            try:
+                self.curve = LoadDoppler(self.filename)
+            except (OSError, ValueError) as msg:
+                print("Doppler file",self.filename,"not usable :",msg)
+                return False
+            if time() > self.curve[0][-1]:
+                print("Doppler file",self.filename,"ends before now")
+                return False
+        elif not self.state.freq_a:
+            print("Tracking not started, VFO A frequency unknown")
+            return False
+        else:
+            self.base = self.state.freq_a
+            self.offset = self.wanted_offset
+            if self.offset is None:
+                self.offset = self.state.freq_b - self.state.freq_a
+        self.manual = 0
+        self.sent = 0
+        self.done = done
+        self.running = True
+        self.thread = threading.Thread(target=self.run, daemon=True, name='Tracker')
+        self.thread.start()
+        return True
+
+    def stop(self):
+        self.running = False
+
+    def toggle(self,done=None) -> bool:
+        # start/stop from a pad, returns True if now tracking
+        if self.running:
+            self.stop()
+            return False
+        return self.start(done)
+
+    def nudge(self,hz:int):
+        # manual offset from JOG A
+        self.manual += hz
+
+    def targets(self,now:float) -> tuple:
+        ########################################
+        # VFO A and B frequencies wanted at now (s since epoch), None once the Doppler curve is over
+        ########################################
+        if self.curve is None:
+            return self.base + self.manual, self.base + self.offset + self.manual * self.txfollow
+        times, rx, tx = self.curve
+        if now > times[-1]:
+            return None
+        index = min(max(bisect.bisect_right(times,now),1),len(times) - 1)
+        ratio = (now - times[index - 1]) / (times[index] - times[index - 1]) if times[index] > times[index - 1] else 0
+        ratio = max(ratio,0)                    # before the first point, its frequencies
+        a = rx[index - 1] + (rx[index] - rx[index - 1]) * ratio
+        b = tx[index - 1] + (tx[index] - tx[index - 1]) * ratio
+        return a + self.manual, b + self.manual * self.txfollow
+
+    def run(self):
+        ########################################
+        # tracking loop, one update every 1/rate s
+        # the rounded frequencies are posted only when they change, the last value only is sent
+        # if the radio is slow, so a late update never holds the controller commands back
+        ########################################
+        period = 1 / self.rate
+        lasta = lastb = None
+        nexttime = perf_counter()
+        print("Tracking started, %s" % ('Doppler file ' + self.filename if self.curve else 'VFO B = A %+d Hz' % self.offset))
+        while self.running:
+            stamp = perf_counter()
+            metrics.observe('tracker_lateness',stamp - nexttime)
+            wanted = self.targets(time())
+            if wanted is None:
+                print("Doppler file",self.filename,"is over")
+                break
+            a, b = (int(round(freq / self.resolution) * self.resolution) for freq in wanted)
+            fields = {}
+            if a != lasta:
+                self.radio.post('FA%011d' % a,stamp)
+                fields['freq_a'] = lasta = a
+            if b != lastb:
+                self.radio.post('FB%011d' % b,stamp)
+                fields['freq_b'] = lastb = b
+            if fields:
+                self.sent += len(fields)
+                metrics.inc('tracker_updates',len(fields))
+                self.state.update(**fields)
+                if DEBUG:
+                    print("Tracking A %d B %d" % (a,b))
+            nexttime += period
+            delay = nexttime - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            else:
+                nexttime = perf_counter()           # late, don't try to catch up
+        self.running = False
+        print("Tracking stopped, %d frequencies sent" % self.sent)
+        if self.done:
+            self.done()
+
+
+if __name__ == "__main__":
+  print ("%s" %(__Title))
+  print ("Version %s, date : %s" % (__Version, __VersionDate))
+  print ("This is a library, to be called from other modules. It does nothing by itself.")
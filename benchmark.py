@@ -0,0 +1,232 @@
+#-------------------------------------------------------------------------------
+# Name:        benchmark
+# Purpose:     Microbenchmarks of the KwdCat parsers and of the DJ_scan hot path
+#              run against recorded or synthetic frames and MIDI events,
+#              with stubbed serial and MIDI objects, no radio nor controller needed
+#
+# Created:     19/10/2026
+# Licence:     GNU General Public License
+#-------------------------------------------------------------------------------
+
+__Title = "midi2ts590 microbenchmarks"
+__Version = "0.1"
+__VersionDate = "19/10/2026"
+
+## Usage
+## benchmark.py                      runs all benchmarks, compares with benchmark_baseline.json if it exists
+## benchmark.py --save               runs them and stores the results as the new baseline
+## benchmark.py --capture file.rec   uses the frames and MIDI events of a Recorder file
+## benchmark.py --filter scan        only the benchmarks with scan in their name
+## exit code is 1 if a benchmark is slower than its baseline by more than --tolerance
+
+## Imports
+import os
+import sys
+import json
+import argparse
+import tracemalloc
+from time import perf_counter_ns
+
+import midi2ts590
+import config
+from KwdCat import KwdCat
+from DJLeds import DJLeds
+from Scanner import Scanner
+from Tracker import Tracker
+from Recorder import ReadRecords, MIDI_IN, CAT_RX, MIDI_EVENT
+
+## synthetic inputs, used when no capture file is given
+FRAMES_IF = ['IF00014050380     +000000000020000000', 'IF00007012000     -001010000130100000']
+FRAMES_FA = ['FA00014049680', 'FB00007010000']
+FRAMES_XI = ['XI000140496802000']
+EVENTS_JOG = [ [[0xB0,48,1,0],1000], [[0xB0,48,127,0],1001] ]          # JOG A both ways
+EVENTS_POT = [ [[0xB0,54,64,0],1000], [[0xB0,57,100,0],1001], [[0xB0,61,30,0],1002] ]   # slider, power, RF gain
+EVENTS_KEY = [ [[144,83,127,0],1000], [[144,83,0,0],1001], [[144,33,127,0],1002], [[144,33,0,0],1003] ]
+
+
+class StubSerial(object):
+    # stands for serial.Serial, writes are counted, reads return the same frame
+    def __init__(self,answer=b''):
+        self.answer = answer
+        self.written = 0
+        self.in_waiting = 0
+    def write(self,data):
+        self.written += len(data)
+        return len(data)
+    def read_until(self,terminator=b';'):
+        return self.answer
+    def read(self,size=1):
+        return b''
+    def inWaiting(self):
+        return 0
+    def reset_input_buffer(self):
+        pass
+    def close(self):
+        pass
+
+class StubMidiIn(object):
+    # stands for pygame.midi.Input, read returns the events one after the other
+    def __init__(self,events):
+        self.events = events
+        self.index = 0
+    def poll(self):
+        return True
+    def read(self,count):
+        event = self.events[self.index % len(self.events)]
+        self.index += 1
+        return [event]
+
+class StubMidiOut(object):
+    # stands for pygame.midi.Output
+    def write(self,messages):
+        pass
+
+
+def LoadCapture(filename:str):
+########################################
+# takes the IF, FA/FB, XI frames and MIDI events of a Recorder file
+########################################
+    frames = {'IF':[], 'FA':[], 'XI':[]}
+    events = []
+    for timestamp, kind, data in ReadRecords(filename):
+        if kind == CAT_RX:
+            for frame in data.decode(errors='ignore').split(';'):
+                if frame[:2] in ('FA','FB'):
+                    frames['FA'].append(frame)
+                elif frame[:2] in frames and len(frame) in (37,17):
+                    frames[frame[:2]].append(frame)
+        elif kind == MIDI_IN:
+            status, data1, data2, data3, miditime = MIDI_EVENT.unpack(data)
+            events.append([[status,data1,data2,data3],miditime])
+    return frames, events
+
+def Setup(events:list):
+########################################
+# gives midi2ts590 the objects it expects, with stubs for the devices
+########################################
+    ts590 = KwdCat()
+    ts590.serial = StubSerial()
+    ts590.connected = True
+    midi2ts590.ts590 = ts590
+    midi2ts590.Midi_In = StubMidiIn(events)
+    midi2ts590.Leds = DJLeds(StubMidiOut())           # not started, frames are not sent
+    midi2ts590.Scan = Scanner(ts590,[])
+    midi2ts590.Track = Tracker(ts590,midi2ts590.State)     # not started
+    midi2ts590.Rec = None
+    midi2ts590.DEBUG = False
+    config.RadioTuningStep = 5
+    config.Pads = {}
+    config.Meter = 0
+    midi2ts590.SubscribeLeds()
+    midi2ts590.State.update(mode='USB',vfo='A',txvfo='A',power=True)
+    return ts590
+
+def Cycle(items:list):
+# endless iterator on items, cheaper than itertools for our use
+    while True:
+        for item in items:
+            yield item
+
+def Measure(function,inputs:list,mintime=0.2) -> tuple:
+########################################
+# runs function on the inputs, in turn
+# returns ns/op, best of 5 runs, and bytes allocated per op (tracemalloc peak)
+########################################
+    source = Cycle(inputs)
+    count = 1
+    while True:                                         # calibrate the number of ops for mintime
+        args = [next(source) for i in range(count)]
+        start = perf_counter_ns()
+        for arg in args:
+            function(arg)
+        elapsed = perf_counter_ns() - start
+        if elapsed >= mintime * 1e9 or count >= 1 << 22:
+            break
+        count *= 2
+    best = elapsed
+    for run in range(4):
+        start = perf_counter_ns()
+        for arg in args:
+            function(arg)
+        best = min(best,perf_counter_ns() - start)
+
+    args = args[:1000]
+    tracemalloc.start()
+    peaks = 0
+    for arg in args:
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        function(arg)
+        peaks += tracemalloc.get_traced_memory()[1] - before
+    tracemalloc.stop()
+    return best / count, peaks / len(args)
+
+
+if __name__ == "__main__":
+    print ("%s" %(__Title))
+    print ("Version %s, date : %s\n" % (__Version, __VersionDate))
+
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--capture", help="Recorder file to take frames and MIDI events from")
+    parser.add_argument("--baseline", default='benchmark_baseline.json', help="baseline file")
+    parser.add_argument("--save", action="store_true", help="store the results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=20, help="allowed slow down in %% before flagging a regression")
+    parser.add_argument("--filter", default='', help="only run the benchmarks with this in their name")
+    parser.add_argument("--time", type=float, default=0.2, help="minimum time of a run in s")
+    args = parser.parse_args()
+
+    frames = {'IF':FRAMES_IF, 'FA':FRAMES_FA, 'XI':FRAMES_XI}
+    events = EVENTS_JOG + EVENTS_POT + EVENTS_KEY
+    if args.capture:
+        captured, capturedevents = LoadCapture(args.capture)
+        for kind in frames:
+            if captured[kind]:
+                frames[kind] = captured[kind]
+        if capturedevents:
+            events = capturedevents
+        print("Capture",args.capture,":",{kind:len(frames[kind]) for kind in frames},"frames,",len(capturedevents),"MIDI events")
+
+    ts590 = Setup(events)
+    benchmarks = [
+        ('ReadCmdIF', ts590.ReadCmdIF, frames['IF']),
+        ('ReadCmdFAFB', ts590.ReadCmdFAFB, frames['FA']),
+        ('ReadCmdXI', ts590.ReadCmdXI, frames['XI']),
+        ('ConvertMode', ts590.ConvertMode, list(range(1,10))),
+        ('MakeDJequalRadio', midi2ts590.MakeDJequalRadio, [frame + ';' for frame in frames['IF']]),
+        ('DJ_scan jog', lambda event: midi2ts590.DJ_scan(), EVENTS_JOG),
+        ('DJ_scan pots', lambda event: midi2ts590.DJ_scan(), EVENTS_POT),
+        ('DJ_scan keys', lambda event: midi2ts590.DJ_scan(), EVENTS_KEY),
+    ]
+    if args.capture and capturedevents:
+        benchmarks.append(('DJ_scan capture', lambda event: midi2ts590.DJ_scan(), capturedevents))
+
+    baseline = {}
+    if os.path.isfile(args.baseline):
+        with open(args.baseline) as basefile:
+            baseline = json.load(basefile)
+
+    results = {}
+    regressions = 0
+    print('%-20s %12s %10s %12s' % ('benchmark','ns/op','B/op','vs baseline'))
+    for name, function, inputs in benchmarks:
+        if args.filter not in name:
+            continue
+        if name.startswith('DJ_scan'):                      # DJ_scan reads its events from Midi_In
+            midi2ts590.Midi_In = StubMidiIn(inputs)
+        nsop, bop = Measure(function,inputs,args.time)
+        results[name] = {'ns_per_op':nsop, 'bytes_per_op':bop}
+        compare = ''
+        if name in baseline:
+            ratio = nsop / baseline[name]['ns_per_op']
+            compare = '%+.1f %%' % ((ratio - 1) * 100)
+            if ratio > 1 + args.tolerance / 100:
+                compare += '  REGRESSION'
+                regressions += 1
+        print('%-20s %12.0f %10.0f %12s' % (name,nsop,bop,compare))
+
+    if args.save:
+        baseline.update(results)
+        with open(args.baseline,'w') as basefile:
+            json.dump(baseline,basefile,indent=1)
+        print("\nBaseline saved in",args.baseline)
+    sys.exit(1 if regressions else 0)
@@ -10,10 +10,33 @@
 # v 0.22    20/01/2023  added thread to poll radio and change mode/vfo accordingly on DJcontroller
 # v 0.26    31/01/2023  added AF volunme control, and added AF vol and RF gain setting at startup
 # v 0.29    03/02/23  added default AF vol, changed ini file with RTS & DTR
+# v 0.30    19/10/2026  added a supervisor thread reconnecting the COM port and restoring the radio settings
+# v 0.31    19/10/2026  added S-meter / power meter bar graph on the pads LEDs
+# v 0.32    19/10/2026  LEDs handled by a non-blocking frame based engine, TX and split indicators
+# v 0.33    19/10/2026  added always-on recording of the MIDI and CAT traffic, see Recorder.py
+# v 0.34    19/10/2026  added live runtime metrics on a local HTTP endpoint, see Metrics.py
+# v 0.35    19/10/2026  added actions bound to pads in [Pads], radio snapshots store/recall
+# v 0.36    19/10/2026  added frequency scanning, see Scanner.py
+# v 0.37    19/10/2026  nothing runs anymore when imported, for benchmark.py. -v option fixed
+# v 0.38    19/10/2026  added a rigctld compatible server answering from a radio state cache, see RigServer.py
+# v 0.39    19/10/2026  MIDI input can be read in its own process, see MidiIngest.py. All the MIDI events read are handled
+# v 0.40    19/10/2026  added CW macros on pads, sent with the radio keyer, see CwKeyer.py
+# v 0.41    19/10/2026  pots and jogs go through a writer thread, stale moves are shed when the radio is slow
+# v 0.42    19/10/2026  at startup only the settings the radio doesn't have yet are sent, optional session restore
+# v 0.43    19/10/2026  radio state kept in one RadioState, the LEDs follow its changes only
+# v 0.44    19/10/2026  added CAT macros on pads, see Macros.py
+# v 0.45    19/10/2026  the radio state is published in a memory mapped file for local programs, see StatusBlock.py
+# v 0.46    19/10/2026  added --profile, a sampling profiler of the live process, see Profiler.py
+# v 0.47    19/10/2026  added VFO A/B tracking, lockstep or Doppler curve, see Tracker.py
+# v 0.48    19/10/2026  added a spot map read from the logging software, the nearest spot is shown on a LED, see SpotMap.py
+# v 0.49    19/10/2026  the ini file is read again when it changes, the new settings are used at once without restart
+# v 0.50    19/10/2026  the controller is opened again when it is unplugged or its USB hub resets, found by its name
+# v 0.51    19/10/2026  added PTT and straight key CW pads on the RTS/DTR lines, see LineKeyer.py
+# v 0.52    19/10/2026  the CAT writes are paced to what the radio can take, measured at start with a probe burst
 
 __Title = "Remote control for TS590 with DJcontrol Compact"
-__Version = "0.29"
-__VersionDate = "03/02/2023"
+__Version = "0.52"
+__VersionDate = "19/10/2026"
 
 
 # import libraries
@@ -21,34 +44,58 @@ import configparser                         #https://docs.python.org/3/library/c
 import os
 import sys
 import argparse
+import types
 import math
-from time import sleep
+import time
+from time import sleep, perf_counter
 from os import environ                      # following 2 lines are to hide pygame welcome message
 environ['PYGAME_HIDE_SUPPORT_PROMPT'] = '1'
 import pygame.midi
-from threading import Thread
+from threading import Thread, Lock, current_thread
 
 ## Import own libraries
-from KwdCat import KwdCat
-
-
-def ReadIniFile():
+from KwdCat import KwdCat, READ_REQUEST
+from DJLeds import DJLeds, ALL_LEDS
+from Recorder import Recorder
+from Metrics import metrics
+from Snapshots import Snapshots
+from Scanner import Scanner, MakeChannels
+from RadioState import RadioState, MODENUMBERS, FIELDS
+from RigServer import RigServer
+from MidiIngest import MidiIngest
+from CwKeyer import CwKeyer
+from Macros import Macros
+from StatusBlock import StatusBlock
+from Profiler import Profiler
+from Tracker import Tracker
+from SpotMap import SpotMap
+from LineKeyer import LineKeyer, LINES
+
+
+def ReadIniFile(settings=None,reload=False) -> bool:
 ########################################
 # Read the ini file and get settings
 #
 # some datas are INT so need to be converted with .getint !
+# settings : where the settings go, config by default, a namespace to check them before a reload
+# reload : an error is shown and False returned, instead of exiting
 ########################################
+    Config = configparser.ConfigParser(allow_no_value=True)
+    config = settings if settings is not None else globals()['config']
     try:
         # read ini file
-        Config.read('midi2ts590.ini')
+        Config.read(inifile)
 
         # check if Midi section exists
         if Config.has_section('Midi'):
             config.MidiDeviceIn = Config.getint('Midi','deviceIN')     # get the device Midi IN, reads and converts in INT
             config.MidiDeviceOut = Config.getint('Midi','deviceOUT')   # get the device Midi OUT
+            config.MidiLedRate = Config.getint('Midi','ledrate',fallback=25)   # LEDs frames per second
+            config.MidiIngest = Config.getint('Midi','ingest',fallback=0)      # 1 = MIDI input read in its own process
+            config.MidiName = Config.get('Midi','name',fallback='')            # devices found by name rather than number
+            config.MidiReconnect = Config.getint('Midi','reconnect',fallback=1)   # 1 = opened again if lost
         else:
-            input("Midi section missing in config file. Please correct this !\nCTRL-C to exit")
-            sys.exit(1)
+            raise configparser.NoSectionError('Midi')
 
         # check if default section exists
         if Config.has_section('Default'):
@@ -57,9 +104,11 @@ def ReadIniFile():
             config.RadioTuningStep = Config.getint('Default','tuningstep')
             config.RadioSniff = Config.getint('Default','radiosniff')
             config.AFvolume = Config.get('Default','afvolume')
+            config.Session = Config.getint('Default','session',fallback=0)       # optional
+            config.SessionFile = Config.get('Default','sessionfile',fallback='midi2ts590.ses')
+            config.IniReload = Config.getint('Default','reload',fallback=1)       # optional
         else:
-            input("Default section missing in config file. Please correct this !\nCTRL-C to exit")
-            sys.exit(1)
+            raise configparser.NoSectionError('Default')
 
         # check if Radio section exists
         if Config.has_section('Radio'):
@@ -77,9 +126,117 @@ def ReadIniFile():
             config.polltime=Config.getint('Radio','polltime')
             config.RadioRxtimeout=Config.getint('Radio','rxtimeout')
             config.RadioTxtimeout=Config.getint('Radio','txtimeout')
+            config.RadioReconnect=Config.getint('Radio','reconnect',fallback=1)     # optional, older ini files don't have it
+            config.RadioMaxLag=Config.getint('Radio','maxlag',fallback=300)         # ms, optional
+            config.RadioPacing=Config.getint('Radio','pacing',fallback=1)           # optional
+            cost = Config.get('Radio','cost',fallback='').strip()                   # ms per command, empty = measured
+            config.RadioCost = float(cost) if cost else None
+            config.RadioBurst = max(Config.getint('Radio','burst',fallback=4),1)
         else:
-            input("Radio section missing in config file. Please correct this !\nCTRL-C to exit")
-            sys.exit(1)
+            raise configparser.NoSectionError('Radio')
+
+        # optional Meter section, older ini files don't have it
+        config.Meter = Config.getint('Meter','meter',fallback=0)
+        config.MeterRate = Config.getint('Meter','rate',fallback=20)
+        if not 20 <= config.MeterRate <= 50:
+            print("Meter section, rate",config.MeterRate,"out of 20-50 Hz, set to",min(max(config.MeterRate,20),50))
+            config.MeterRate = min(max(config.MeterRate,20),50)
+        config.MeterLeds = [int(led) for led in Config.get('Meter','leds',fallback='').split(',') if led.strip()]
+
+        # optional Recorder section
+        config.Record = Config.getint('Recorder','record',fallback=1)
+        config.RecordFile = Config.get('Recorder','file',fallback='midi2ts590.rec')
+        config.RecordSize = Config.getint('Recorder','size',fallback=65536)
+
+        # optional Metrics section
+        config.Metrics = Config.getint('Metrics','metrics',fallback=0)
+        config.MetricsPort = Config.getint('Metrics','port',fallback=9590)
+
+        # optional Pads section, pad MIDI note = action and its arguments
+        config.Pads = {}
+        if Config.has_section('Pads'):
+            for pad,action in Config.items('Pads'):
+                if pad.startswith('#') or pad in PAD_OPTIONS or not action:     # comments, settings or no action
+                    continue
+                if not pad.isdigit() or action.split()[0] not in PAD_ACTIONS:
+                    print("Pads section, wrong setting ignored :",pad,"=",action)
+                    continue
+                config.Pads[int(pad)] = action.split()
+        config.SnapshotFile = Config.get('Pads','snapshotfile',fallback='midi2ts590.snp')
+
+        # the meter bar graph can't share a LED with an indicator, a button or a pad, it would overwrite them
+        overlap = [led for led in config.MeterLeds if led in INDICATOR_LEDS or led in BUTTON_LEDS or led in config.Pads]
+        if overlap:
+            print("Meter section, LEDs already used, removed from the bar graph :",overlap)
+            config.MeterLeds = [led for led in config.MeterLeds if led not in overlap]
+
+        # optional Scan section, frequencies in kHz
+        config.ScanStart = Config.getfloat('Scan','start',fallback=14000.0)
+        config.ScanStop = Config.getfloat('Scan','stop',fallback=14350.0)
+        config.ScanStep = Config.getfloat('Scan','step',fallback=5.0)
+        config.ScanChannels = Config.get('Scan','channels',fallback='')
+        config.ScanDwell = Config.getint('Scan','dwell',fallback=50)
+        config.ScanThreshold = Config.getint('Scan','threshold',fallback=10)
+
+        # optional RigServer section
+        config.Rigctld = Config.getint('RigServer','rigctld',fallback=0)
+        config.RigctldPort = Config.getint('RigServer','port',fallback=4532)
+        config.RigctldRefresh = Config.getint('RigServer','refresh',fallback=500)
+
+        # optional CW section, keyer settings and macros name = text
+        config.CwWpm = Config.getint('CW','wpm',fallback=25)
+        config.CwSerial = Config.getint('CW','serial',fallback=1)
+        config.CwAbort = Config.get('CW','abort',fallback='RX')
+        config.CwMacros = {}
+        if Config.has_section('CW'):
+            for name,text in Config.items('CW'):
+                if not name.startswith('#') and name not in CW_OPTIONS and text:
+                    config.CwMacros[name] = text
+
+        # optional Status section
+        config.Status = Config.getint('Status','status',fallback=0)
+        config.StatusFile = Config.get('Status','file',fallback='midi2ts590.sts')
+
+        # optional Tracking section, offset in kHz, empty keeps the one of the VFOs at start
+        config.TrackRate = min(max(Config.getint('Tracking','rate',fallback=10),1),50)
+        offset = Config.get('Tracking','offset',fallback='').strip()
+        config.TrackOffset = round(float(offset) * 1000) if offset else None
+        config.TrackFile = Config.get('Tracking','file',fallback='')
+        config.TrackResolution = Config.getint('Tracking','resolution',fallback=10)
+        config.TrackJogStep = Config.getint('Tracking','jogstep',fallback=10)
+        config.TrackTxFollow = Config.getint('Tracking','txfollow',fallback=1)
+
+        # optional Spots section, window in kHz, led empty for the console only
+        config.Spots = Config.getint('Spots','spots',fallback=0)
+        config.SpotFile = Config.get('Spots','file',fallback='spots.txt')
+        config.SpotWindow = round(Config.getfloat('Spots','window',fallback=0.5) * 1000)
+        config.SpotReload = max(Config.getfloat('Spots','reload',fallback=2.0),0.1)
+        led = Config.get('Spots','led',fallback='').strip()
+        config.SpotLed = int(led) if led else None
+        if config.SpotLed in INDICATOR_LEDS + BUTTON_LEDS or config.SpotLed in config.Pads or config.SpotLed in config.MeterLeds:
+            print("Spots section, LED",config.SpotLed,"already used, spots shown on the console only")
+            config.SpotLed = None
+
+        # optional Keying section, the lines used for keying are at 0 when not keying
+        config.KeyPtt = Config.get('Keying','ptt',fallback='').strip().lower()
+        config.KeyCw = Config.get('Keying','key',fallback='').strip().lower()
+        config.KeyMaxTx = Config.getint('Keying','maxtx',fallback=180)
+        for name,line in (('ptt',config.KeyPtt),('key',config.KeyCw)):
+            if line and (line not in LINES or (line == 'rts' and config.RadioRtsCts) or (line == 'dtr' and config.RadioDsrDtr)):
+                print("Keying section,",name,"=",line,"not usable, rts or dtr without its flow control expected")
+                setattr(config,'KeyPtt' if name == 'ptt' else 'KeyCw','')
+        if config.KeyPtt and config.KeyPtt == config.KeyCw:
+            print("Keying section, ptt and key on the same line, key not used")
+            config.KeyCw = ''
+        if 'rts' in (config.KeyPtt,config.KeyCw):
+            config.RadioRts = 0
+        if 'dtr' in (config.KeyPtt,config.KeyCw):
+            config.RadioDtr = 0
+
+        # optional Macros section, name = CAT commands separated by ;
+        config.Macros = {}
+        if Config.has_section('Macros'):
+            config.Macros = {name:text for name,text in Config.items('Macros') if not name.startswith('#') and text}
 
         # check if Commands section exists
         if Config.has_section('Commands'):
@@ -88,15 +245,26 @@ def ReadIniFile():
             config.Radiocmd3 = Config.get('Commands','cmd3')
             #pass # do nothing
         else:
-            input("Commands section missing in config file. Please correct this !\nCTRL-C to exit")
-            sys.exit(1)
+            raise configparser.NoSectionError('Commands')
 
+    # if a section is missing, raise an error
+    except configparser.NoSectionError as msg:
+        message = "%s section missing in config file. Please correct this !" % msg.section
     # if an option is missing, raise an error
     except configparser.NoOptionError:
-        input ("Missing option(s) in config file !\nPlease correct this or remove file to allow creating a default one !")
-        sys.exit(1)
+        message = "Missing option(s) in config file !\nPlease correct this or remove file to allow creating a default one !"
+    # a wrong value or a file being written
+    except (configparser.Error, ValueError) as msg:
+        message = "Config file error : %s" % msg
     else:   # otherwise, we're happy
-        print ("Config file correctly read & parsed")
+        if not reload:
+            print ("Config file correctly read & parsed")
+        return True
+    if reload:
+        print("\n%s not reloaded, the settings in use are kept : %s" % (inifile,message.replace('\n',' ')))
+        return False
+    input(message + "\nCTRL-C to exit")
+    sys.exit(1)
 
 
 def CreateIniFile():
@@ -116,11 +284,22 @@ def CreateIniFile():
     Config.set('Default','tuningstep','5')
     Config.set('Default','radiosniff','0')
     Config.set('Default','afvolume','0')
+    Config.set('Default','# reload = 1 : the changes of this file are used at once, see manual for those needing a restart')
+    Config.set('Default','reload','1')
+    Config.set('Default','# session = 1 starts with the settings of the last session instead of the defaults above')
+    Config.set('Default','session','0')
+    Config.set('Default','sessionfile','midi2ts590.ses')
     # add section Midi
     Config.add_section('Midi')
     # add settings
     Config.set('Midi','deviceIN','1')
     Config.set('Midi','deviceOUT','3')
+    Config.set('Midi','ledrate','25')
+    Config.set('Midi','ingest','0')
+    Config.set('Midi','# name : the devices are found by name (part of it), deviceIN & OUT are used if empty or not found')
+    Config.set('Midi','# reconnect = 1 opens the controller again when it has been unplugged')
+    Config.set('Midi','name','DJControl Compact')
+    Config.set('Midi','reconnect','1')
     # add section Radio
     Config.add_section('Radio')
     # add settings
@@ -138,6 +317,104 @@ def CreateIniFile():
     Config.set('Radio','polltime','1000')
     Config.set('Radio','rxtimeout','0')
     Config.set('Radio','txtimeout','0')
+    Config.set('Radio','reconnect','1')
+    Config.set('Radio','maxlag','300')
+    Config.set('Radio','# pacing = 1 spaces the CAT writes out so the radio is never overrun, cost : ms per command, empty = measured at start')
+    Config.set('Radio','pacing','1')
+    Config.set('Radio','cost','')
+    Config.set('Radio','burst','4')
+    # add section Meter
+    Config.add_section('Meter')
+    Config.set('Meter','# meter = 1 shows the S-meter (RX) or power meter (TX) as a bar graph on the LEDs below')
+    Config.set('Meter','# LEDs not used by an indicator, a button or a pad, e.g 45,48 if they are not bound to snapshots')
+    Config.set('Meter','meter','0')
+    Config.set('Meter','rate','20')
+    Config.set('Meter','leds','')
+    # add section Recorder
+    Config.add_section('Recorder')
+    Config.set('Recorder','# record = 1 keeps the last MIDI & CAT traffic in file, size in records of 64 bytes')
+    Config.set('Recorder','record','1')
+    Config.set('Recorder','file','midi2ts590.rec')
+    Config.set('Recorder','size','65536')
+    # add section Metrics
+    Config.add_section('Metrics')
+    Config.set('Metrics','# metrics = 1 serves runtime metrics on http://127.0.0.1:port/metrics')
+    Config.set('Metrics','metrics','0')
+    Config.set('Metrics','port','9590')
+    # add section Pads
+    Config.add_section('Pads')
+    Config.set('Pads','# bind actions to pads, pad MIDI note number = action, see manual')
+    Config.set('Pads','# snapshot n : press to recall the radio setup n, hold 1 s to store it')
+    Config.set('Pads','# scan : starts/stops the scan set in [Scan]')
+    Config.set('Pads','# cw name : sends the CW macro name of [CW], press again to abort')
+    Config.set('Pads','# macro name : sends the CAT macro name of [Macros]')
+    Config.set('Pads','# track : starts/stops the VFO tracking set in [Tracking]')
+    Config.set('Pads','# ptt : PTT while pressed, ptt_latch : press for PTT ON/OFF, key : CW key, on the lines of [Keying]')
+    Config.set('Pads','snapshotfile','midi2ts590.snp')
+    Config.set('Pads','45','snapshot 1')
+    Config.set('Pads','48','snapshot 2')
+    # add section Scan
+    Config.add_section('Scan')
+    Config.set('Scan','# scan VFO A from start to stop by step (kHz), or through channels list (kHz, comma separated)')
+    Config.set('Scan','# dwell in ms on each channel, stops when S-meter >= threshold (0-30)')
+    Config.set('Scan','start','14000.0')
+    Config.set('Scan','stop','14350.0')
+    Config.set('Scan','step','5.0')
+    Config.set('Scan','channels','')
+    Config.set('Scan','dwell','50')
+    Config.set('Scan','threshold','10')
+    # add section CW
+    Config.add_section('CW')
+    Config.set('CW','# CW macros sent by pads bound to cw name, # is replaced by the serial number')
+    Config.set('CW','# wpm : keyer speed set before sending, 0 keeps the radio one. abort : command(s) stopping the keyer')
+    Config.set('CW','wpm','25')
+    Config.set('CW','serial','1')
+    Config.set('CW','abort','RX')
+    Config.set('CW','cq','CQ CQ DE TK5EP TK5EP K')
+    Config.set('CW','exch','5NN #')
+    # add section Status
+    Config.add_section('Status')
+    Config.set('Status','# status = 1 publishes the radio state in file for local programs, see StatusBlock.py')
+    Config.set('Status','status','0')
+    Config.set('Status','file','midi2ts590.sts')
+    # add section Spots
+    Config.add_section('Spots')
+    Config.set('Spots','# spots = 1 shows the spot nearest to the VFO frequency, from file (kHz call comment), read again when it changes')
+    Config.set('Spots','# window : kHz around the VFO. led : lit when a spot is within window, empty for the console only')
+    Config.set('Spots','spots','0')
+    Config.set('Spots','file','spots.txt')
+    Config.set('Spots','window','0.5')
+    Config.set('Spots','led','')
+    Config.set('Spots','reload','2')
+    # add section Keying
+    Config.add_section('Keying')
+    Config.set('Keying','# lines keying the radio from the ptt, ptt_latch and key pads : rts, dtr or empty, as set in the radio USB keying menu')
+    Config.set('Keying','# maxtx : the PTT is released after maxtx s, 0 never')
+    Config.set('Keying','ptt','')
+    Config.set('Keying','key','')
+    Config.set('Keying','maxtx','180')
+    # add section Tracking
+    Config.add_section('Tracking')
+    Config.set('Tracking','# VFO B = VFO A + offset (kHz, empty = as at start), or VFO A & B from the Doppler file (UTC time rx tx in Hz)')
+    Config.set('Tracking','# rate : updates per second. resolution : Hz. jogstep : Hz per JOG A step. txfollow : 1, -1 inverting, 0')
+    Config.set('Tracking','rate','10')
+    Config.set('Tracking','offset','')
+    Config.set('Tracking','file','')
+    Config.set('Tracking','resolution','10')
+    Config.set('Tracking','jogstep','10')
+    Config.set('Tracking','txfollow','1')
+    # add section Macros
+    Config.add_section('Macros')
+    Config.set('Macros','# name = CAT commands separated by ; bound to pads with macro name')
+    Config.set('Macros','# wait 200 : 200 ms delay. CW,CW-R?KS025 : only in these modes. check : reads the settings back')
+    Config.set('Macros','ft8','FR0;FT0;FA00014074000;MD2;SH13;SL00')
+    # add section RigServer
+    Config.add_section('RigServer')
+    Config.set('RigServer','# rigctld = 1 serves the hamlib rigctld protocol on 127.0.0.1:port, use rig model 2 (NET rigctl)')
+    Config.set('RigServer','# refresh in ms of the radio state cache, 0 = only from the poll/sniff')
+    Config.set('RigServer','rigctld','0')
+    Config.set('RigServer','port','4532')
+    Config.set('RigServer','refresh','500')
     # add section Commands
     Config.add_section('Commands')
     # add settings
@@ -159,51 +436,90 @@ def CreateIniFile():
 
 def ChangeMode(mode:str,ledonly = False):
 ################################
-# change mode on radio and lights led under button
+# change mode on radio, the LED under the button follows the state
 #
-# input:    mode: str must be 'CW', 'USB', 'LSB', 'FSK'
-#           ledonly: bool if we ONLY want to change the LED status NOT sending to radio
+# input:    mode: str 'CW', 'USB', 'LSB', 'FSK'... see RadioState.MODES
+#           ledonly: bool if we ONLY want to change the state NOT sending to radio
 #           by default ledonly False
 ################################
-    #global RadioMode
-    if mode == 'CW':
-        config.RadioMode = 'CW'
-        strCat = 'MD3'     # MODE = CW
-        # switch on backlight
-        Midi_Out.write([ [[144,49,127],0], [[144,50,0],0], [[144,51,0],0] , [[144,52,0],0] ])
-    elif mode == 'LSB':
-        config.RadioMode = 'LSB'
-        strCat = 'MD1'
-        Midi_Out.write([ [[144,49,0],0] , [[144,50,0],0] , [[144,51,0],0] , [[144,52,127],0] ])
-    elif mode == 'USB':
-        config.RadioMode = 'USB'
-        strCat = 'MD2'
-        Midi_Out.write([ [[144,49,0],0] , [[144,50,0],0] , [[144,51,127],0] , [[144,52,0],0] ])
-    elif mode == 'FSK':
-        config.RadioMode = 'FSK'
-        strCat = 'MD6'
-        Midi_Out.write([ [[144,49,0],0] , [[144,50,127],0] , [[144,51,0],0] , [[144,52,0],0] ])
+    if mode not in MODENUMBERS:
+        return
     if ledonly == False:                    # if we only want to change the Leds and not send to radio
-        ts590.query(strCat,0)
+        ts590.query('MD' + MODENUMBERS[mode],0)
+    State.update(mode=mode)
 
 
 def ChangeVFO(vfo:str,ledonly=False):
 ########################################
-# put radio on VFO A or B
+# put radio on VFO A or B, split off
 #
 # input vfo:str must be 'A' or 'B'
 ########################################
-    if vfo == 'A':
-        strCat='FR0'
-        config.RadioVFO = 'A'
-        # switch on backlights
-        Midi_Out.write([ [[144,35,127],0] , [[144,34,0],0] , [[144,3,0],0] , [[144,4,0],0] ])
-    elif vfo == 'B':
-        config.RadioVFO = 'B'
-        strCat='FR1'
-        Midi_Out.write([[[144,34,127],0] , [[144,35,0],0] , [[144,3,0],0] , [[144,4,0],0] ])
+    if vfo not in ('A','B'):
+        return
     if ledonly == False:
-        ts590.query(strCat,0)
+        ts590.query('FR0' if vfo == 'A' else 'FR1',0)
+    State.update(vfo=vfo,txvfo=vfo,split=False)
+
+
+MODE_LEDS = {'CW':49, 'FSK':50, 'USB':51, 'LSB':52}    # LED of each mode button
+## LEDs showing a state, TF-SET, CW tune, split, VFO, REC/TX, modes, XIT, RIT
+INDICATOR_LEDS = (1,2,3,4,34,35,43,49,50,51,52,82,83)
+## LEDs lit while their button is held, DA_KP1, DA_KP2, VFO A=B, RIT clear
+BUTTON_LEDS = (1,2,33,81)
+def LedsMode(changes:dict,state:dict):
+# mode buttons LEDs, the one of the current mode on
+    Leds.set_many({led:int(mode == state['mode']) for mode,led in MODE_LEDS.items()})
+def LedsVFO(changes:dict,state:dict):
+# VFO A/B LEDs, or the split indicator
+    if state['split']:
+        DJ_LedSPLIT(state['vfo'])
+    elif state['vfo'] == 'A':
+        Leds.set_many({35:1, 34:0, 3:0, 4:0})
+    else:
+        Leds.set_many({34:1, 35:0, 3:0, 4:0})
+def LedsTX(changes:dict,state:dict):
+    DJ_LedTX(state['tx'])
+def LedsPower(changes:dict,state:dict):
+    DJ_LedRECORD(int(state['power']))
+def LedsRIT(changes:dict,state:dict):
+    DJ_LedDB_SYNC(int(state['rit']))
+def LedsXIT(changes:dict,state:dict):
+    DJ_LedDB_CUE(int(state['xit']))
+def LedsMeter(changes:dict,state:dict):
+# S-meter bar graph on the config.MeterLeds LEDs
+    lit = round(state['smeter'] * len(config.MeterLeds) / 30)     # SM is 0-30
+    DJ_LedsWrite({led:(i < lit) for i,led in enumerate(config.MeterLeds)})
+
+def LedsSpot(changes:dict,state:dict):
+# the spot nearest to the VFO received on, shown once on the console and on config.SpotLed
+    global LastSpot
+    freq = state['freq_b'] if state['vfo'] == 'B' else state['freq_a']
+    stamp = perf_counter()
+    spot = Spots.nearest(freq)
+    metrics.observe('spot_lookup',perf_counter() - stamp)
+    if spot == LastSpot:
+        return
+    LastSpot = spot
+    if spot:
+        print("Spot %.1f %s %s (%+d Hz)" % (spot[0] / 1000,spot[1],spot[2],freq - spot[0]))
+    if config.SpotLed:
+        DJ_LedsWrite({config.SpotLed:spot is not None})
+
+def SubscribeLeds():
+################################
+# the LEDs showing the radio state are only written when that state changes
+################################
+    State.subscribe(('mode',),LedsMode)
+    State.subscribe(('vfo','txvfo','split'),LedsVFO)
+    State.subscribe(('tx',),LedsTX)
+    State.subscribe(('power',),LedsPower)
+    State.subscribe(('rit',),LedsRIT)
+    State.subscribe(('xit',),LedsXIT)
+    if config.Meter == 1 and config.MeterLeds:
+        State.subscribe(('smeter',),LedsMeter)
+    if Spots:
+        State.subscribe(('freq_a','freq_b','vfo'),LedsSpot)
 
 
 def DJ_init():
@@ -236,6 +552,44 @@ def DJ_info():
         # make a nice table of this
         print ('nr: {: <3}Interface: {: <10} Name: {: <30}   {: <8} Opened:{}'.format(i, str(interf,'UTF-8'), str(name,'UTF-8'), in_out, opened))
 
+def DJ_find(name:str,output:bool):
+#############################################
+# number of the first MIDI device whose name has name in it, not opened, input or output
+# None if there is none
+#############################################
+    for i in range(pygame.midi.get_count()):
+        (interf, devname, input, devoutput, opened) = pygame.midi.get_device_info(i)
+        if name.lower() in str(devname,'UTF-8').lower() and (devoutput if output else input) and not opened:
+            return i
+    return None
+
+def DJ_name(device:int) -> str:
+# name of a MIDI device
+    return str(pygame.midi.get_device_info(device)[1],'UTF-8')
+
+def DJ_open():
+#############################################
+# opens the MIDI input, by the ingest process if asked, and output, the devices found by name
+# output : (input,output), None if one of them is not found or can't be opened
+#############################################
+    devin = DJ_find(MidiNames[0],False)
+    devout = DJ_find(MidiNames[1],True)
+    if devin is None or devout is None:
+        return None
+    if config.MidiIngest == 1:                          # read by the ingest process, same poll() and read()
+        midi_in = MidiIngest(devin)
+        if not midi_in.start():
+            midi_in.close()
+            return None
+    else:
+        midi_in = pygame.midi.Input(devin)
+    try:
+        midi_out = pygame.midi.Output(devout)
+    except:
+        midi_in.close()
+        return None
+    return midi_in, midi_out
+
 def DJ_initInput(device:int)->bool:
 # check if the selected input device is correct
     info = pygame.midi.get_device_info(device)     # get infos about input device, returns (interf, name, input, output, opened)
@@ -281,61 +635,186 @@ def DJ_initOutput(device:int)->bool:
             print("MIDI output initialized",device)
         return True
 
+################################
+# All LEDs go through the Leds engine, see DJLeds.py
+# the calls only change the wanted state, the engine sends it
+# with the next frame, so they never block
+################################
 def DJ_LedsON():
-    Midi_Out.write([ [[144,1,127],0], [[144,2,127],0], [[144,3,127],0] , [[144,4,127],0] , [[144,33,127],0], [[144,34,127],0], [[144,35,127],0] , [[144,49,127],0], [[144,50,127],0], [[144,51,127],0] , [[144,52,127],0] , [[144,81,127],0], [[144,82,127],0], [[144,83,127],0] , [[144,43,127],0] , [[144,45,127],0] , [[144,48,127],0] ])
+    Leds.set_many({led:1 for led in ALL_LEDS})
 def DJ_LedsOFF():
-    Midi_Out.write([ [[144,1,0],0], [[144,2,0],0], [[144,3,0],0] , [[144,4,0],0] , [[144,33,0],0], [[144,34,0],0], [[144,35,0],0] , [[144,49,0],0], [[144,50,0],0], [[144,51,0],0] , [[144,52,0],0] , [[144,81,0],0], [[144,82,0],0], [[144,83,0],0] , [[144,43,0],0] , [[144,45,0],0] , [[144,48,0],0] ])
+    Leds.set_many({led:0 for led in ALL_LEDS})
+def DJ_LedsWrite(states:dict):
+# several LEDs at once, input dict {led note:state}
+    Leds.set_many(states)
 def DJ_LedsBlink(numTimes,period):
-    for i in range(0,numTimes):     ## Run loop numTimes
-        DJ_LedsON()
-        sleep(period)
-        DJ_LedsOFF()
-        sleep(period)
+    for led in ALL_LEDS:
+        Leds.blink(led,period * 2,numTimes)     # period ON then period OFF
+def DJ_LedTX(state:int):
+# blinks the REC LED while transmitting
+    if state:
+        Leds.blink(0x2B,0.3)
+    else:
+        Leds.stop(0x2B)
+def DJ_LedSPLIT(vfo:str):
+# split indicator, pulses DA_KP3 for split A/B, DA_KP4 for split B/A
+    Leds.set_many({0x23:0, 0x22:0})                     # VFO A & B LEDs off
+    if vfo == 'A':
+        Leds.set(0x04,0)
+        Leds.pulse(0x03)                                # keeps its phase if already pulsing
+    elif vfo == 'B':
+        Leds.set(0x03,0)
+        Leds.pulse(0x04)
+    else:
+        Leds.set_many({0x03:0, 0x04:0})
 def DJ_LedRECORD(state:int):
-    Midi_Out.write([[[0x90,0x2B,state],0]])
+    Leds.set(0x2B,state)
 def DJ_LedAUTO(state:int):
-    MidiOut.write([[[0x90,0x2D,state],0]])
+    Leds.set(0x2D,state)
 def DJ_LedDA_SYNC(state:int):
-    Midi_Out.write([[[0x90,0x23,state],0]])
+    Leds.set(0x23,state)
 def DJ_LedDA_CUE(state:int):
-    Midi_Out.write([[[0x90,0x22,state],0]])
+    Leds.set(0x22,state)
 def DJ_LedDA_PLAY(state:int):
-    Midi_Out.write([[[0x90,0x21,state],0]])
+    Leds.set(0x21,state)
 def DJ_LedDA_KP1(state:int):
-    Midi_Out.write([[[0x90,0x01,state],0]])
+    Leds.set(0x01,state)
 def DJ_LedDA_KP2(state:int):
-    Midi_Out.write([[[0x90,0x02,state],0]])
+    Leds.set(0x02,state)
 def DJ_LedDA_KP3(state:int):
-    Midi_Out.write([[[0x90,0x03,state],0]])
+    Leds.set(0x03,state)
 def DJ_LedDA_KP4(state:int):
-    Midi_Out.write([[[0x90,0x04,state],0]])
+    Leds.set(0x04,state)
 def DJ_LedDB_SYNC(state:int):
-    Midi_Out.write([[[0x90,0x53,state],0]])
+    Leds.set(0x53,state)
 def DJ_LedDB_CUE(state:int):
-    Midi_Out.write([[[0x90,0x52,state],0]])
+    Leds.set(0x52,state)
 def DJ_LedDB_PLAY(state:int):
-    Midi_Out.write([[[0x90,0x51,state],0]])
+    Leds.set(0x51,state)
 def DJ_LedMODE(state:int):
-    Midi_Out.write([[[0x90,0x30,state],0]])
+    Leds.set(0x30,state)
 def DJ_LedDB_KP1(state:int):
-    Midi_Out.write([[[0x90,0x31,state],0]])
+    Leds.set(0x31,state)
 def DJ_LedDB_KP2(state:int):
-    Midi_Out.write([[[0x90,0x32,state],0]])
+    Leds.set(0x32,state)
 def DJ_LedDB_KP3(state:int):
-    Midi_Out.write([[[0x90,0x33,state],0]])
+    Leds.set(0x33,state)
 def DJ_LedDB_KP4(state:int):
-    Midi_Out.write([[[0x90,0x34,state],0]])
+    Leds.set(0x34,state)
+
+PAD_ACTIONS = ('snapshot','scan','cw','macro','track','ptt','ptt_latch','key')     # actions that can be bound to pads
+PAD_OPTIONS = ('snapshotfile',)      # settings in the [Pads] section which aren't pads
+CW_OPTIONS = ('wpm','serial','abort')   # settings in the [CW] section which aren't macros
+def PadAction(pad:int,value:int,stamp=None):
+################################
+# runs the action bound to a pad in the [Pads] section
+#
+# input:    pad: MIDI note of the pad
+#           value: 127 pressed, 0 released
+#           stamp: perf_counter() time of the MIDI event, for the keying latency
+################################
+    action = config.Pads[pad]
+    if value == 127:
+        PadPressed[pad] = perf_counter()
+    held = perf_counter() - PadPressed.get(pad,perf_counter())
+
+    if action[0] == 'snapshot':                         # short press recalls, hold 1 s stores
+        if value == 127:
+            Leds.set(pad,1)
+        else:
+            Leds.set(pad,0)
+            if held >= 1:
+                Snap.store(action[1])
+                Leds.blink(pad,0.2,3)                   # stored !
+            else:
+                answerIF = Snap.recall(action[1])
+                if answerIF:
+                    MakeDJequalRadio(answerIF + ';')    # LEDs as the radio now is
+
+    elif action[0] == 'scan':                           # start/stop the scan
+        if value == 127:
+            if Scan.toggle(lambda: Leds.set(pad,0)):    # LED off however the scan stops
+                Leds.blink(pad,0.5)                     # blinks while scanning
+
+    elif action[0] == 'cw':                             # send a CW macro, any cw pad aborts it
+        if value == 127:
+            if Keyer.running:
+                Keyer.abort()
+            elif len(action) > 1 and Keyer.play(action[1]):
+                Leds.blink(pad,0.2,2)
+
+    elif action[0] == 'macro':                          # CAT commands
+        if value == 127 and len(action) > 1 and Macro.play(action[1]):
+            Leds.blink(pad,0.2,1)
+
+    elif action[0] == 'track':                          # start/stop the VFO tracking
+        if value == 127 and Track.toggle(lambda: Leds.set(pad,0)):
+            Leds.blink(pad,1.0,0,0.8)                   # mostly ON while tracking
+
+    elif action[0] in ('ptt','key'):                    # momentary, on the RTS/DTR line
+        Lines.set(action[0],value == 127,stamp)
+
+    elif action[0] == 'ptt_latch':                      # press for ON, press again for OFF
+        if value == 127:
+            Lines.toggle('ptt',stamp)
+
+def KeyChanged(what:str,state:bool):
+# the pads of the PTT or key show its state, the radio TX LED follows the PTT at once
+    DJ_LedsWrite({pad:state for pad,action in config.Pads.items() if action[0].split('_')[0] == what})
+    if what == 'ptt':
+        State.update(tx=state)
 
 def DJ_scan():
+#####################################
+# reads the MIDI events waiting and handles them in turn
+#####################################
+    global MidiLost
+    try:
+        events = Midi_In.read(10)
+    except Exception as msg:
+        if 'overflow' in str(msg).lower():              # PortMidi buffer full, events lost
+            metrics.inc('midi_dropped')
+        else:
+            metrics.inc('midi_errors')
+            if config.MidiReconnect == 1:               # opened again by SuperviseMidi
+                MidiLost = True
+                print("\nMIDI controller lost :",msg)
+            else:
+                print("Midi device read error")
+        return
+    for event in events:
+        DJ_event(event)
+
+
+def EventTime(timestamp:int) -> float:
+#####################################
+# perf_counter() time of a MIDI event, from its timestamp in ms
+# the MIDI clock is tied to perf_counter() by the event handled the soonest
+#####################################
+    global MidiOffset
+    offset = perf_counter() - timestamp / 1000
+    if MidiOffset is None or offset < MidiOffset or offset > MidiOffset + 10:    # new MIDI clock if 10 s off
+        MidiOffset = offset
+    return timestamp / 1000 + MidiOffset
+
+
+def DJ_event(event):
+#####################################
+# handles one MIDI event [[device,status,control,value],timestamp]
+# pots and jogs are posted to the writer with the event time, buttons are sent at once
+#####################################
     try:
-        event = Midi_In.read(10)[0]
         data = event[0]
         device = data[0]
         status = data[1]
         control = data[2]
         value = data[3]
         timestamp = event[1]
+        stamp = EventTime(timestamp)
 
+        metrics.inc('midi_events')
+        if Rec:
+            Rec.midi(device,status,control,value,timestamp)
         if DEBUG:
             print ("Device:",device,"Status",status,"Control",control,"Value:",value,timestamp)
 
@@ -344,30 +823,36 @@ def DJ_scan():
             if status == 48:                            # JOG A activity detected
                 if DEBUG:
                     print("JOG_A turned")
-                if control < 64:
-                    if config.RadioVFO == 'A':
-                        ts590.VFOfreq(0,0,config.RadioTuningStep)   # VFOfreq(0=VFOA,0=up,1=step)
-                    if config.RadioVFO == 'B':
-                        ts590.VFOfreq(1,0,config.RadioTuningStep)   # VFOfreq(0=VFOA,0=up,1=step)
+                if Scan.running:                        # tuning stops the scan
+                    Scan.stop()
+                if Track.running:                       # while tracking, JOG A adds a manual offset
+                    Track.nudge(config.TrackJogStep if control < 64 else -config.TrackJogStep)
+                elif control < 64:
+                    if State.vfo == 'A':
+                        ts590.VFOfreq(0,0,config.RadioTuningStep,stamp)   # VFOfreq(0=VFOA,0=up,1=step)
+                    if State.vfo == 'B':
+                        ts590.VFOfreq(1,0,config.RadioTuningStep,stamp)   # VFOfreq(0=VFOA,0=up,1=step)
                 else:
-                    if config.RadioVFO == 'A':
-                        ts590.VFOfreq(0,1,config.RadioTuningStep)
-                    if config.RadioVFO == 'B':
-                        ts590.VFOfreq(1,1,config.RadioTuningStep)
+                    if State.vfo == 'A':
+                        ts590.VFOfreq(0,1,config.RadioTuningStep,stamp)
+                    if State.vfo == 'B':
+                        ts590.VFOfreq(1,1,config.RadioTuningStep,stamp)
             elif status == 49:                          # JOG B activity detected
                 if DEBUG:
                     print("JOG_B turned")
-                if control < 64:                        # turned CW
-                    ts590.RITUp()                       # send RIT up
+                if Scan.running:                        # while scanning, JOG B sets the scan speed
+                    Scan.speed(control < 64)
+                elif control < 64:                      # turned CW
+                    ts590.RITUp(stamp)                  # send RIT up
                 else :                                  # turned CCW
-                    ts590.RITDown()                     # send RIT down
+                    ts590.RITDown(stamp)                # send RIT down
             elif status == 54:                          # SLIDER activity detected
                 if DEBUG:
                     print(control*2)
                 strCat = format ("AG%04d"% ( control *2  ))     # slider value is 0-127, RX VOLUME needs 0-255
-                ts590.query(strCat,0)                           # send to radio
+                ts590.post(strCat,stamp)                        # send to radio
 
-            elif status == 59 and config.RadioMode != 'CW' and config.RadioMode != 'FSK':     # if DA_MEDIUM pot moved change SL command but NOT in CW
+            elif status == 59 and State.mode != 'CW' and State.mode != 'FSK':     # if DA_MEDIUM pot moved change SL command but NOT in CW
                 global oldsl
                 sl = math.floor(( control / 9.5))       # to get values from 0-13
                 if DEBUG:
@@ -375,49 +860,59 @@ def DJ_scan():
                 if sl != oldsl:                         # if the new value SL is different from previous one
                     strCat = format ("SL%02d"%sl)       # format de CAT string
                     oldsl = sl                          # set the old value of SL
-                    ts590.query(strCat,0)               # send CAT command
+                    ts590.post(strCat,stamp)            # send CAT command
+                else:
+                    metrics.inc('midi_coalesced')       # same value, nothing sent
 
-            elif status == 60 and config.RadioMode =='CW':              # CW bandwidth 050-2500
+            elif status == 60 and State.mode =='CW':              # CW bandwidth 050-2500
                 global oldfwcw
                 fwcwval =[50,80,100,150,200,250,300,400,500,600,1000,1500,2000,2500]    # these are the values for FW command is CW
                 fwcw = math.floor(control / 9.5)                                      # to get values from 0-13
                 if fwcw != oldfwcw:
                     strCat = format ("FW%04d"% fwcwval[fwcw])
-                    ts590.query(strCat,0)
+                    ts590.post(strCat,stamp)
                     oldfwcw = fwcw
+                else:
+                    metrics.inc('midi_coalesced')       # same value, nothing sent
                 if DEBUG:
                     print("CW FW:",strCat)
 
-            elif status == 60 and config.RadioMode =='FSK':         #FSK bandwith 250-1500
+            elif status == 60 and State.mode =='FSK':         #FSK bandwith 250-1500
                 global oldfwfsk
                 fwfskval = [250,500,1000,1500]                      # values for FW in FSK
                 fwfsk = math.floor(control / 41)
                 if fwfsk != oldfwfsk:
                     strCat= format ("FW%04d"% fwfskval[fwfsk])
-                    ts590.query(strCat,0)
+                    ts590.post(strCat,stamp)
                     oldfwfsk = fwfsk
+                else:
+                    metrics.inc('midi_coalesced')       # same value, nothing sent
                 if DEBUG:
                     print("FSK FW:",strCat)
 
-            elif status == 63 and config.RadioMode != 'CW' and config.RadioMode != 'FSK':
+            elif status == 63 and State.mode != 'CW' and State.mode != 'FSK':
                 global oldsh
                 sh = math.floor(control / 9.5)                     # SH command 00-13
                 if sh != oldsh:
                     strCat = format ("SH%02d"% sh)
-                    ts590.query(strCat,0)
+                    ts590.post(strCat,stamp)
                     oldsh = sh
+                else:
+                    metrics.inc('midi_coalesced')       # same value, nothing sent
                 if DEBUG:
                     print("SH:",sh)
 
 
-            elif status == 64 and config.RadioMode =='CW':              # CW only shift command IS
+            elif status == 64 and State.mode =='CW':              # CW only shift command IS
                 global oldis
                 istab =[300,350,400,450,500,550,600,650,700,750,800,850,900,950,1000] # IS values for CW
                 isval = math.floor(control/8.5)
                 if isval != oldis:
                     strCat = format ("IS %04d"%istab[isval])
-                    ts590.query(strCat,0)
+                    ts590.post(strCat,stamp)
                     oldis = isval
+                else:
+                    metrics.inc('midi_coalesced')       # same value, nothing sent
                 if DEBUG:
                     print ("IS:",isval)
 
@@ -426,18 +921,20 @@ def DJ_scan():
                 if DEBUG:
                     print ("%03d"%out)
                 strCat = format ("PC%03d"% out)
-                ts590.query(strCat,0)
+                ts590.post(strCat,stamp)
 
             elif status == 61:
                 out = control * 2
                 strCat = format ("RG%03d"%out)
-                ts590.query(strCat,0)                                    # RG gain
+                ts590.post(strCat,stamp)                                 # RG gain
                 if DEBUG:
                     print("RG:",out)
 
         ## check if buttonss have been pressed
         if device == 144:                               # a key has been pressed
-            if status == 1 and control == 127:          # DA_KP1 button pressed
+            if status in config.Pads:                   # pads bound to an action in the ini file come first
+                PadAction(status,control,stamp)
+            elif status == 1 and control == 127:        # DA_KP1 button pressed
                 if DEBUG:
                     print("DA_KP1")
                 ts590.query('TS1',0)                    # send TF-SET ON
@@ -448,7 +945,7 @@ def DJ_scan():
                 ts590.query('TS0',0)                    # TF-SET OFF
                 DJ_LedDA_KP1(0)                         # LED off
             elif status == 2:                           # DA_KP2 pressed
-                if control == 127 and config.RadioMode == 'CW':
+                if control == 127 and State.mode == 'CW':
                     if DEBUG:
                         print('DA_KP2 pressed')
                     ts590.query('CA1',0)                # CW TUNE ON
@@ -461,19 +958,13 @@ def DJ_scan():
                     if DEBUG:
                         print('DA_KP3 pressed')
                     ts590.query('FR0;FT1',0)            # SPLIT A/B
-                    DJ_LedDA_KP3(1)                     # LED on
-                    DJ_LedDA_KP4(0)                     # all other mode LEDs off
-                    DJ_LedDA_SYNC(0)
-                    DJ_LedDA_CUE(0)
+                    State.update(vfo='A',txvfo='B',split=True)  # KP3 pulses, all other mode LEDs off
             elif status == 4:                           #DA_KP4 pressed
                 if control == 127:
                     if DEBUG:
                         print('DA_KP3 pressed')
                     ts590.query('FR1;FT0',0)            #SPLIT B/A
-                    DJ_LedDA_KP3(0)                     # LED off
-                    DJ_LedDA_KP4(1)                     # LED on
-                    DJ_LedDA_SYNC(0)                    # LED VFO A off
-                    DJ_LedDA_CUE(0)                     # LED VFO B off
+                    State.update(vfo='B',txvfo='A',split=True)  # KP4 pulses, VFO A & B LEDs off
             elif status == 33:                          #VFO A=B
                 if control == 127:
                     if DEBUG:
@@ -509,15 +1000,13 @@ def DJ_scan():
             elif status == 43:                            # REC button
                 if control == 127:                      # pressed
                     if DEBUG:
-                        print('REC pressed RadioIsON :',config.RadioIsON)
-                    if config.RadioIsON == 1:           # is the radio ON flag
+                        print('REC pressed, radio ON :',State.power)
+                    if State.power:                     # is the radio ON
                         ts590.RadioOnOff(0)             # switch radio off
-                        DJ_LedRECORD(0)                 # REC LED off
-                        config.RadioIsON = 0            # swap flag
+                        State.update(power=False)       # REC LED off
                     else:                               # radio is off
                         ts590.RadioOnOff(1)             # turn it on
-                        DJ_LedRECORD(1)
-                        config.RadioIsON = 1
+                        State.update(power=True)
             elif status == 49:                            # DA_KP1 button
                 if control == 127:                      # pressed
                     if DEBUG:
@@ -542,26 +1031,20 @@ def DJ_scan():
                 if control == 127:
                     if DEBUG:
                         print('DB_SYNC pressed')
-                    if config.RITisON == 0:             # RIT ON/OFF toggle
+                    if not State.rit:                   # RIT ON/OFF toggle
                         ts590.query('RT1',0)            # RT command
-                        DJ_LedDB_SYNC(1)
-                        config.RITisON = 1
-                    elif config.RITisON == 1:
+                    else:
                         ts590.query('RT0',0)
-                        DJ_LedDB_SYNC(0)
-                        config.RITisON = 0
+                    State.update(rit=not State.rit)     # DB_SYNC LED follows
             elif status == 82:                            # DB_CUE pressed
                 if control == 127:
                     if DEBUG:
                         print('DB_CUE pressed')
-                    if config.XITisON == 0:             #  XIT toggle
+                    if not State.xit:                   #  XIT toggle
                         ts590.query('XT1',0)
-                        DJ_LedDB_CUE(1)
-                        config.XITisON = 1
-                    elif config.XITisON == 1:
+                    else:
                         ts590.query('XT0',0)
-                        DJ_LedDB_CUE(0)
-                        config.XITisON = 0
+                    State.update(xit=not State.xit)     # DB_CUE LED follows
             elif status == 81:                            # DB_PLAY pressed
                 if control == 127:
                     if DEBUG:
@@ -573,7 +1056,8 @@ def DJ_scan():
 
             ## add here more functions if needed
     except:
-        print("Midi device read error")
+        print("Midi event error :",event)
+        metrics.inc('midi_errors')
 
 
 def CheckRadioState():
@@ -587,122 +1071,124 @@ def CheckRadioState():
 #####################################
     answerIF = ts590.query('IF',37)                 # read radio IF frame
     if answerIF != None:                            # if we have a valid answer
-        mode = ts590.ReadCmdIF(answerIF)[5]         # extract the mode
-        split = ts590.ReadCmdIF(answerIF)[7]        # extract split
-        VFO = ts590.ReadCmdIF(answerIF)[6]          # extract VFO
+        metrics.inc('poll_frames')
+        State.decode(answerIF + ';')                # the LEDs follow what has changed
 
         if DEBUG:
-            print("\nVariables in CheckRadioState:")
+            print("\nState in CheckRadioState:")
             print(time.ctime())                     # print time for checking
-            print("split:",split)
-            print ("VFO:",VFO)
-            print("Mode:",mode)
-
-        if 1<= int(mode) <= 9:                      #if we have a valid mode
-            modeStr = ts590.ConvertMode(int(mode))  # convert it to readable string
-            ChangeMode(modeStr,1)
-
-        # check VFO states
-        if split == '0':                            # split off
-            if VFO == '0':                          # if VFO A main
-                ChangeVFO('A',1)
-            elif VFO == '1':
-                ChangeVFO('B',1)
-        if split == '1':            # split on
-            if VFO == '0':           # VFO A is main
-                DJ_LedDA_KP3(1)                     # LED off
-                DJ_LedDA_KP4(0)                     # LED on
-                DJ_LedDA_SYNC(0)                    # LED VFO A off
-                DJ_LedDA_CUE(0)                     # LED VFO B off
-                config.radioVFO ='A'
-            else:
-                DJ_LedDA_KP3(0)                     # LED off
-                DJ_LedDA_KP4(1)                     # LED on
-                DJ_LedDA_SYNC(0)                    # LED VFO A off
-                DJ_LedDA_CUE(0)                     # LED VFO B off
-                config.radioVFO ='B'
-    else:
-        pass
+            print(State.get())
 
 
 def MakeDJequalRadio(rcvdatas):
 #####################################
 # Check the datas flow on the COM port between the radio and logging software
-# if an answer to IF request is found, (most logging software rely on this)
-# check if it is complete and change the LEDs on console and flags accordingly
-#
-# some glitches due to state difference between polling time
-# may need some work 23/01/2023
+# the frames found (IF, FA, FB, MD, FR, FT...) update the radio state
+# and the LEDs on console follow what has changed
 #####################################
     try:
-        start = rcvdatas.find("IF")                     # find the start of an IF in the received frame
-        if start != -1 and rcvdatas[start+37] == ";":   # if found (!=1) and if at position 37 we've a ; separator
-            rcvdatas = rcvdatas[start:start+37]         # we extract the IF frame
-            answerIF = ts590.ReadCmdIF(rcvdatas)        # we extract all infos from the above frame
-
-            split = answerIF[7]                         # extract split
-            VFO = answerIF[6]                           # extract VFO
-            mode = answerIF[5]                          # extract the mode
-            modeStr = ts590.ConvertMode(int(mode))      # convert to readable mode
-
+        if State.decode(rcvdatas):
+            metrics.inc('sniff_frames')
             if DEBUG:
-                print("\nvariables in MakeDJequalRadio:")
+                print("\nState in MakeDJequalRadio:")
                 print("rcvdatas:",rcvdatas)
-                print("split:",split,type(split))
-                print ("VFO:",VFO,type(VFO))
-                print("Mode:",mode,type(mode))
-                print("ModeStr:",modeStr,type(modeStr))
-                print("RadioMode",config.RadioMode,type(config.RadioMode))
-                print("RadioVFO",config.RadioVFO,type(config.RadioVFO))
-
-            #if 1<= int(mode) <= 9:                      #if we have a valid mode
-            if modeStr != config.RadioMode:
-                mode = ts590.ConvertMode(int(mode))  # convert it to readable string
-                ChangeMode(modeStr,0)                   # change only Leds, no CAT
-
-            # check VFO states
-            if split == '0':                            # split off
-                if VFO == '0':                          # if VFO A main
-                    ChangeVFO('A',1)
-                if VFO == '1':
-                    ChangeVFO('B',1)
-
-            if split == '1':            # split on
-                if VFO == '0':           # VFO A is main
-                    DJ_LedDA_KP3(1)                     # LED off
-                    DJ_LedDA_KP4(0)                     # LED on
-                    DJ_LedDA_SYNC(0)                    # LED VFO A off
-                    DJ_LedDA_CUE(0)                     # LED VFO B off
-                    config.RadioVFO = 'A'
-                else:
-                    DJ_LedDA_KP3(0)                     # LED off
-                    DJ_LedDA_KP4(1)                     # LED on
-                    DJ_LedDA_SYNC(0)                    # LED VFO A off
-                    DJ_LedDA_CUE(0)                     # LED VFO B off
-                    config.RadioVFO = 'B'
-        else:
-            pass
+                print(State.get())
     except:
         print('Exception in MakeDJequalRadio')
 
-def pollRadio(polltime):
+def StartupRadio():
+#####################################
+# brings the radio to the startup settings : defaults or last session, then cmd1-cmd3
+# the radio is read with one IF query and one pipelined read
+# and only the commands changing something are sent, in one single write
+#####################################
+    wanted = {'PS':'PS1', 'RG':'RG255', 'AG':'AG' + config.AFvolume.rjust(4,'0'),
+              'MD':'MD' + MODENUMBERS.get(config.RadioMode,'2'), 'FR':'FR' + ('1' if config.RadioVFO == 'B' else '0')}
+    if config.Session == 1:
+        wanted.update(LoadSession())
+    cmds = list(wanted.values())
+    for radiocmd in (config.Radiocmd1,config.Radiocmd2,config.Radiocmd3):
+        if radiocmd:
+            cmds += [cmd.strip().upper() for cmd in radiocmd.split(';') if cmd.strip()]
+
+    current = {}
+    answerIF = ts590.query('IF',37)
+    if answerIF:                                        # the radio is ON
+        current = {'PS':'PS1', 'MD':'MD' + answerIF[29], 'FR':'FR' + answerIF[30], 'RT':'RT' + answerIF[23], 'XT':'XT' + answerIF[24]}
+        reads = [READ_REQUEST.get(cmd[:2],cmd[:2]) for cmd in cmds if len(cmd) > 2 and cmd[:2] not in current]
+        answers = ts590.pipeline(list(dict.fromkeys(reads)),timeout=0.5,wait=True) or {}
+        for request,answer in answers.items():
+            current[request[:2]] = answer
+    tosend = [cmd for cmd in cmds if current.get(cmd[:2]) != cmd]     # commands without parameter are always sent
+    if tosend:
+        ts590.query(';'.join(tosend),0)
+    print("Startup : %d of %d commands sent %s" % (len(tosend),len(cmds),';'.join(tosend)))
+
+    State.decode((answerIF or '') + ';' + ';'.join(cmds) + ';')     # the radio as it was, then what has been set
+
+
+def LoadSession() -> dict:
+#####################################
+# the settings saved at the end of the last session {command:set command}
+#####################################
+    session = configparser.ConfigParser()
+    session.optionxform = str
+    session.read(config.SessionFile)
+    if not session.has_section('Session'):
+        return {}
+    return dict(session['Session'])
+
+
+def SaveSession():
+#####################################
+# saves the last settings sent to the radio, for the next start
+# but the power, the radio is always switched ON at start
+# the frequencies are the last ones seen, the jog moves aren't in the settings sent
+# the other sections of the file, e.g the CW serial number, are kept
+#####################################
+    session = configparser.ConfigParser()
+    session.optionxform = str
+    session.read(config.SessionFile)
+    settings = {prefix:cmd for prefix,cmd in ts590.settings.items() if prefix != 'PS'}
+    if State.freq_a:
+        settings['FA'] = 'FA%011d' % State.freq_a
+    if State.freq_b:
+        settings['FB'] = 'FB%011d' % State.freq_b
+    session['Session'] = settings
+    with open(config.SessionFile,'w') as sesfile:
+        session.write(sesfile)
+
+
+def StartPolling():
+# starts the thread polling (radiosniff = 1) or sniffing (radiosniff = 2) the radio
+# the one started before, if any, stops by itself as it is no longer PollThread
+    global PollThread
+    PollThread = None
+    if config.RadioSniff == 1:                                  # polling the radio by sending IF regularely IF command
+        PollThread = Thread(target=pollRadio, daemon=True, name='Poll Radio')
+    elif config.RadioSniff == 2:                                # sniff the COM data flow and extract infos
+        PollThread = Thread(target=SniffRadio, daemon=True, name='Sniff Radio')
+    if PollThread:
+        PollThread.start()
+
+def pollRadio():
 # check periodically the radio state
     global stop_thread                                          # set a flag global variable needed to stop the thread
     while True:
         try:
-            sleep(polltime/1000)               # to poll is ms set in config file
+            sleep(config.polltime/1000)        # to poll is ms set in config file, read each time as it may be reloaded
             if DEBUG:
                 print("\nVariables in pollRadio:")
                 print(time.ctime())                     # print time for checking
                 print("polltime:",config.polltime)
             CheckRadioState()
-            if stop_thread:                         # if the flag is set and thread join
+            if stop_thread or current_thread() is not PollThread:   # if the flag is set and thread join, or replaced
                 break                               # stop thread
         except:
             print("Exception in Pollradio thread")
             pass
 
-def SniffRadio(polltime):
+def SniffRadio():
     global stop_thread                                          # set a flag global variable needed to stop the thread
     while True:
         try:
@@ -710,76 +1196,334 @@ def SniffRadio(polltime):
                 print("\nVariables in pollRadio:")
                 print(time.ctime())                     # print time for checking
                 print("polltime:",config.polltime)
-            sleep(polltime/1000)               # to poll is ms set in config file
+            sleep(config.polltime/1000)        # to poll is ms set in config file, read each time as it may be reloaded
+            if stop_thread or current_thread() is not PollThread:   # if the flag is set and thread join, or replaced
+                break                               # stop thread, before reading what the new one should get
             rcvdatas = ts590.read()
-            MakeDJequalRadio(rcvdatas)
-            if stop_thread:                         # if the flag is set and thread join
-                break                               # stop thread
+            if rcvdatas is not None:                # None if the port is lost
+                MakeDJequalRadio(rcvdatas)
 
         except:
             print("Exception in SniffRadio thread")
             pass
 
-###################################################
-## MAIN
-##
-## reads configuration file or create it if not exist
-## creates a connection to TS590 with the Kenwood library
-## inits the DJcontroller and creates in/out objects
-## polls the DJcontroller and sends command to TS590
-###################################################
-if __name__ == '__main__':
-    print ("\n%s - (c) Patrick EGLOFF aka TK5EP" %(__Title))
-    print ("Version %s %s made in Corsica :-) \n" % (__Version, __VersionDate) )
+def MeterRadio():
+#####################################
+# streams the S-meter (RX) or power meter (TX) with SWR/ALC readings
+# at config.MeterRate Hz, with pipelined SM/RM reads that give way to the control commands
+# the answers go to State, the bar graph on the config.MeterLeds LEDs follows it
+# when sniffing, the sniffer may read some answers first, it decodes them to State as well
+#####################################
+    global stop_thread
+    nexttime = perf_counter()
+    while not stop_thread:
+        try:
+            period = 1 / config.MeterRate                   # read each time as it may be reloaded
+            nexttime += period
+            answers = ts590.pipeline(['SM0','RM'],timeout=period)
+            if answers:                                     # None if cycle skipped for control commands
+                metrics.inc('meter_reads')
+                State.decode(';'.join(answers.values()) + ';')
+            delay = nexttime - perf_counter()
+            if delay > 0:
+                sleep(delay)
+            else:
+                nexttime = perf_counter()                   # late, don't try to catch up
+        except:
+            print("Exception in MeterRadio thread")
+            sleep(1)
+
+def DJ_poll() -> bool:
+#####################################
+# True if MIDI events are waiting, an error means the controller is lost
+#####################################
+    global MidiLost
+    try:
+        return Midi_In.poll()
+    except Exception as msg:
+        metrics.inc('midi_errors')
+        if config.MidiReconnect == 1:
+            MidiLost = True
+            print("\nMIDI controller lost :",msg)
+        return False
+
+def SuperviseMidi(checktime):
+#####################################
+# watch the MIDI controller
+# when it is lost (unplugged, USB hub reset...), the MIDI input & output are closed
+# the devices are listed again and the ones with the same names opened, every 0.2 to 1 s
+# the LEDs engine then sends all the LEDs states in one write. Nothing is sent to the radio
+# a lost input is seen by its read errors, a lost output by the LEDs engine, the ingest process by its end
+#####################################
+    global stop_thread, MidiLost, Midi_In, Midi_Out
+    delay = 0.2
+    lost = None                                             # when it has been lost
+    while not stop_thread:
+        try:
+            if config.MidiIngest == 1 and not MidiLost and not Midi_In.process.is_alive():
+                MidiLost = True
+                print("\nMIDI ingest process stopped")
+            if not (MidiLost or Leds.lost):                 # everything fine
+                delay = 0.2
+                lost = None
+                sleep(checktime)
+                continue
+            lost = lost or perf_counter()
+            with MidiLock:                                  # the main loop doesn't use the devices meanwhile
+                MidiLost = True
+                Leds.set_output(None)
+                for device in (Midi_In,Midi_Out):
+                    try:
+                        device.close()
+                    except:
+                        pass
+                pygame.midi.quit()                          # the devices are only listed again by a new init
+                pygame.midi.init()
+                devices = DJ_open()
+                if devices:
+                    Midi_In, Midi_Out = devices
+                    Leds.set_output(Midi_Out)               # all the LEDs at the next frame
+                    MidiLost = False
+                    metrics.inc('midi_reconnects')
+                    print("MIDI controller back in %.2f s" % (perf_counter() - lost))
+                    continue
+            sleep(delay)
+            delay = min(delay * 2, 1)                       # backoff
+        except:
+            print("Exception in SuperviseMidi thread")
+            sleep(1)
+
+def SuperviseRadio(checktime):
+#####################################
+# watch the COM port
+# when it is lost (USB glitch, unplugged cable...), try to reopen it
+# waiting a bit longer after each failure, max 1 s so we are back quickly
+# once reopened, check the radio answers and restore its last known settings
+# the port is closed again if the radio doesn't answer (still booting, wrong device...)
+# so the next pass tries again instead of taking the port for alive
+#####################################
+    global stop_thread
+    delay = 0.1                                             # first retry delay in s
+    while not stop_thread:
+        try:
+            if ts590.port_alive():                          # everything fine
+                delay = 0.1
+                sleep(checktime)
+                continue
+            if delay == 0.1:                                # just lost, RTS/DTR no longer keying
+                Lines.reset()
+            if ts590.reopen_port():                         # port is back
+                if ts590.checkradio():                      # and the radio answers
+                    recovery = ts590.restore_state()        # send back mode, VFO, gains, split...
+                    print("COM port recovered in %.2f s, %.2f s after it was lost" % (recovery,ts590.outage_time))
+                    continue
+                ts590.close_port()                          # not alive until the radio answers
+            sleep(delay)
+            delay = min(delay * 2, 1)                       # backoff
+        except:
+            print("Exception in SuperviseRadio thread")
+            sleep(1)
+
+## settings used at once when the ini file is reloaded, all the others need a restart
+## some are read at each use (tuning step, pads...), the others are handed to the objects using them
+RELOADED = ('RadioTuningStep','RadioSniff','polltime','RadioMaxLag','MidiLedRate',
+            'MeterRate','MeterLeds','Pads','ScanStart','ScanStop','ScanStep','ScanChannels','ScanDwell','ScanThreshold',
+            'CwWpm','CwSerial','CwAbort','CwMacros','Macros','SpotWindow','SpotLed','TrackRate','TrackOffset','TrackFile',
+            'TrackResolution','TrackJogStep','TrackTxFollow','Radiocmd1','Radiocmd2','Radiocmd3')
+
+def WatchIniFile(checktime):
+#####################################
+# watch the ini file, when it changes read it in a namespace of its own
+# and hand it to the main loop if it is right, the settings in use are kept if not
+#####################################
+    global stop_thread, NewConfig
+    mtime = os.stat(inifile).st_mtime
+    while not stop_thread:
+        try:
+            sleep(checktime)
+            if os.stat(inifile).st_mtime == mtime:
+                continue
+            mtime = os.stat(inifile).st_mtime
+            settings = types.SimpleNamespace()
+            if ReadIniFile(settings,reload=True):
+                NewConfig = settings                        # used by the main loop, between two MIDI events
+        except OSError:                                     # file being replaced by the editor
+            pass
+        except:
+            print("Exception in WatchIniFile thread")
+            sleep(1)
+
+def ApplyIniFile(settings):
+#####################################
+# uses the settings of the reloaded ini file, called by the main loop between two MIDI events
+# so the controller never sees half of them. The COM port and the MIDI devices are kept open
+# only the objects whose settings have changed are updated
+# compared with the ini file as read, config has values changed at startup (timeouts in s, MIDI devices found by name)
+#####################################
+    global Macro, LastSpot
+    stamp = perf_counter()
+    changed = [name for name,value in vars(settings).items() if getattr(IniSettings,name,None) != value]
+    later = [name for name in changed if name not in RELOADED]
+    changed = [name for name in changed if name in RELOADED]
+    if not changed:
+        if later:
+            print("\n%s reloaded, changes used at the next start :" % inifile,', '.join(later))
+        return
+    oldleds = config.MeterLeds
+    oldspotled = config.SpotLed
+    oldcmds = (config.Radiocmd1,config.Radiocmd2,config.Radiocmd3)
+    for name in changed:
+        setattr(config,name,getattr(settings,name))
+        setattr(IniSettings,name,getattr(settings,name))
+
+    if 'RadioSniff' in changed:                             # the thread polling or sniffing is replaced
+        StartPolling()
+    if 'RadioMaxLag' in changed:
+        ts590.maxlag = config.RadioMaxLag / 1000
+    if 'MidiLedRate' in changed:
+        Leds.rate = config.MidiLedRate
+    if 'MeterLeds' in changed:                              # LEDs no longer in the bar graph switched off
+        DJ_LedsWrite({led:0 for led in oldleds if led not in config.MeterLeds})
+    if {'ScanStart','ScanStop','ScanStep','ScanChannels'} & set(changed):
+        Scan.channels = MakeChannels(config.ScanStart,config.ScanStop,config.ScanStep,config.ScanChannels)
+    Scan.dwell = config.ScanDwell / 1000
+    Scan.threshold = config.ScanThreshold
+    Keyer.macros = {name.lower():text.upper() for name,text in config.CwMacros.items()}
+    Keyer.wpm = config.CwWpm
+    Keyer.abort_cmd = config.CwAbort
+    if 'CwSerial' in changed:                               # a new start, e.g for a new contest
+        Keyer.start_serial = Keyer.serial = config.CwSerial
+        Keyer.save_serial()
+    if 'Macros' in changed:                                 # encoded again, the running ones go on
+        Macro = Macros(ts590,State,config.Macros)
+    Track.rate = config.TrackRate                           # used at the next start of the tracking
+    Track.wanted_offset = config.TrackOffset
+    Track.filename = config.TrackFile
+    Track.resolution = max(config.TrackResolution,1)
+    Track.txfollow = config.TrackTxFollow
+    if Spots:
+        Spots.window = config.SpotWindow
+        if oldspotled and oldspotled != config.SpotLed:
+            DJ_LedsWrite({oldspotled:0})
+        LastSpot = None                                     # shown again with the new settings
+        LedsSpot({},State.get())
+    cmds = [cmd for cmd,old in zip((config.Radiocmd1,config.Radiocmd2,config.Radiocmd3),oldcmds) if cmd and cmd != old]
+    if cmds:                                                # startup commands changed, sent now
+        ts590.send(';'.join(cmd.strip().upper() for cmd in ';'.join(cmds).split(';') if cmd.strip()) + ';')
+
+    elapsed = perf_counter() - stamp
+    metrics.observe('ini_reload',elapsed)
+    print("\n%s reloaded in %.1f ms :" % (inifile,elapsed * 1000),', '.join(changed))
+    if later:
+        print("changes used at the next start :",', '.join(later))
 
 # global variables from a config file
 import config   # to create a set of global variables
+inifile = 'midi2ts590.ini'    # the settings
 oldfwcw = 0     # for memorizing mode changes
 oldfwfsk = 0    #
 oldsh = 0       #
 oldis = 0       #
 oldsl = 0       #
-RadioMode = ''
-RadioVFO = ''
-received_datas = ''
-RadioIsON = 0
-RITisON = 0
-XITisON = 0
-
-#########################################
-# create some optional arguments for startup
-# -h : help
-# -v : make verbose for debugging
-# -p : show COM ports
-# -m : show MIDI ports
-#########################################
-parser = argparse.ArgumentParser()
-parser.add_argument("-m","--midi", help="show available MIDI dervices",action="store_true")
-parser.add_argument("-c","--comports", help="show COM ports",action="store_true")
-parser.add_argument("-v","--verbose", help="increase output verbosity",action="store_true")
-args = parser.parse_args()
+stop_thread = False   # flag to stop the threads
+Rec = None            # the traffic Recorder, if any
+Rig = None            # the rigctld server, if any
+Status = None         # the status block, if any
+Prof = None           # the sampling profiler, if started with --profile
+PollThread = None     # the thread polling or sniffing the radio, if any
+NewConfig = None      # settings of the ini file reloaded, waiting for the main loop
+IniSettings = None    # settings as read from the ini file, before the changes made at startup
+MidiLost = False      # the MIDI controller is lost, SuperviseMidi opens it again
+MidiLock = Lock()     # held by the main loop while it uses the MIDI input, by SuperviseMidi while it opens it again
+MidiNames = ('','')   # names of the MIDI input & output, to find them again
+Spots = None          # the spot map, if any
+LastSpot = None       # the spot shown
+State = RadioState()  # last known radio state, the LEDs and the rigctld server follow it
+PadPressed = {}       # {pad:time it has been pressed}
+MidiOffset = None     # perf_counter() - MIDI clock, see EventTime
+DEBUG = False         # set with the -v option
 
 # init ini file parser
 # allow_no_value=True -> to allow adding comments without value, so no trailing =
 Config = configparser.ConfigParser(allow_no_value=True)
 
-# use start option to set debug infos, like MIDI commands generated, CAT dialog, etc...
-if args.verbose:        # -v --verbose
-    DEBUG = True
-else:
-    DEBUG= False
-
-#DEBUG=True # to force the debugging
+###################################################
+## MAIN
+##
+## reads configuration file or create it if not exist
+## creates a connection to TS590 with the Kenwood library
+## inits the DJcontroller and creates in/out objects
+## polls the DJcontroller and sends command to TS590
+##
+## nothing runs when this file is imported, e.g by benchmark.py
+###################################################
+if __name__ == '__main__':
+    print ("\n%s - (c) Patrick EGLOFF aka TK5EP" %(__Title))
+    print ("Version %s %s made in Corsica :-) \n" % (__Version, __VersionDate) )
 
-    inifile = 'midi2ts590.ini'                              # check if ini file exists and read the settings
-    if os.path.isfile(inifile):
+    #########################################
+    # create some optional arguments for startup
+    # -h : help
+    # -v : make verbose for debugging
+    # -p : show COM ports
+    # -m : show MIDI ports
+    # --profile : sample the threads and write collapsed stacks at exit
+    #########################################
+    parser = argparse.ArgumentParser()
+    parser.add_argument("-m","--midi", help="show available MIDI dervices",action="store_true")
+    parser.add_argument("-c","--comports", help="show COM ports",action="store_true")
+    parser.add_argument("-v","--verbose", help="increase output verbosity",action="store_true")
+    parser.add_argument("--profile", help="sample the threads and write their collapsed stacks to file at exit or on SIGUSR1/CTRL-BREAK",
+                        nargs='?', const='midi2ts590.prof', metavar='file')
+    args = parser.parse_args()
+
+    if args.profile:                                        # from the start, startup and connections included
+        Prof = Profiler(args.profile)
+        Prof.start()
+        print("Profiling to",args.profile)
+
+    # use start option to set debug infos, like MIDI commands generated, CAT dialog, etc...
+    if args.verbose:        # -v --verbose
+        DEBUG = True
+
+    #DEBUG=True # to force the debugging
+
+    if os.path.isfile(inifile):                             # check if ini file exists and read the settings
         ReadIniFile()
     else:
         print('\nConfiguration file does not exist !\nCreating it in a few seconds, then edit it to your needs if something goes wrong.\n')
         sleep(3)
         CreateIniFile()                                     # if not, create it
+    IniSettings = types.SimpleNamespace(**{name:value for name,value in vars(config).items() if not name.startswith('_')})
 
     ts590 = KwdCat()                                        # create instance of KwdCat the Kenwood CAT library
+    Snap = Snapshots(ts590,config.SnapshotFile)             # radio setups bound to pads
+    Scan = Scanner(ts590,MakeChannels(config.ScanStart,config.ScanStop,config.ScanStep,config.ScanChannels),
+                   config.ScanDwell / 1000,config.ScanThreshold)
+    Keyer = CwKeyer(ts590,config.CwMacros,config.CwWpm,config.CwSerial,config.CwAbort,config.SessionFile)
+    Macro = Macros(ts590,State,config.Macros)               # CAT macros, checked and encoded now
+    Lines = LineKeyer(ts590,config.KeyPtt,config.KeyCw,config.KeyMaxTx,KeyChanged)     # PTT and key on RTS/DTR
+    Track = Tracker(ts590,State,config.TrackRate,config.TrackOffset,config.TrackFile,
+                    config.TrackResolution,config.TrackTxFollow)
+    if config.Spots == 1:                                   # spots from the logging software
+        Spots = SpotMap(config.SpotFile,config.SpotWindow)
+        print("%d spots read from %s" % (Spots.load(),config.SpotFile))
+        Spots.watch(config.SpotReload)
+    if config.Status == 1:                                  # radio state for the local programs
+        try:
+            Status = StatusBlock(config.StatusFile)
+            State.subscribe(FIELDS,Status.publish)
+            Status.publish({},State.get())
+        except OSError as msg:
+            Status = None
+            print("Status file not available :",msg)
+
+    if config.Record == 1:                                  # always-on traffic recorder
+        try:
+            Rec = Recorder(config.RecordFile,config.RecordSize)
+            ts590.recorder = Rec
+        except OSError as msg:
+            print("Recorder not available :",msg)
 
     DJ_init()                                               # init
     if args.midi:                                           # if optional -m or --midi argument at startup
@@ -811,52 +1555,97 @@ else:
         input('\nCTRL-C to EXIT')
         sys.exit(0)
 
+    if config.RadioPacing == 1:                             # the radio never given more than it can take
+        cost = config.RadioCost / 1000 if config.RadioCost is not None else ts590.calibrate()
+        if cost is None:
+            print("CAT pacing : the probe burst wasn't answered, 5 ms per command assumed")
+            cost = 0.005
+        ts590.set_pacing(cost,config.RadioBurst)
+        report = ts590.pacing_report()
+        print("CAT pacing : line %.0f bytes/s, radio %.2f ms per command %s, up to %.0f commands/s\n" %
+              (report['link_rate'],cost * 1000,'set' if config.RadioCost is not None else 'measured',report['theoretical']))
+
+    if config.MidiName:                                     # devices found by name, their numbers change when plugged elsewhere
+        found = (DJ_find(config.MidiName,False),DJ_find(config.MidiName,True))
+        if None in found:
+            print("MIDI device",config.MidiName,"not found, deviceIN & deviceOUT used")
+        else:
+            config.MidiDeviceIn, config.MidiDeviceOut = found
     try:
         if DJ_initInput(config.MidiDeviceIn):                   # check if device is input, not busy
-            Midi_In = pygame.midi.Input(config.MidiDeviceIn)    # open Midi input device
+            if config.MidiIngest == 1:                          # read by the ingest process, same poll() and read()
+                Midi_In = MidiIngest(config.MidiDeviceIn)
+                if not Midi_In.start():
+                    raise OSError('MIDI ingest process')
+            else:
+                Midi_In = pygame.midi.Input(config.MidiDeviceIn)    # open Midi input device
             print('MIDI input device ready')
         if DJ_initOutput(config.MidiDeviceOut):                 # check output device
             Midi_Out = pygame.midi.Output(config.MidiDeviceOut) # open Midi output device
+            Leds = DJLeds(Midi_Out,config.MidiLedRate)          # LEDs engine, the only one writing to Midi_Out
+            Leds.start()
             print('MIDI output device ready')
+        MidiNames = (DJ_name(config.MidiDeviceIn),DJ_name(config.MidiDeviceOut))    # to find them again if lost
     except:
         print("\nMidi device error, device busy or not present ?")
         input('\nCTRL-C to EXIT')
         sys.exit()
 
     DJ_LedsBlink(3,0.3)                                     # some fancy animation at startup
+    Leds.wait()                                             # shown until its end, the LEDs below would stop it
 
-    ts590.query('PS1',0)                                    # send radio ON
-    config.RadioIsON = 1                                    # flag for radio ON/OFF state
-    DJ_LedRECORD(1)                                         # switch LED ON
-    ts590.query('RG255',0)                                  # set RF gain at MAX
-    AFvolume = 'AG'+ config.AFvolume.rjust(4,'0')           # send AF volume at default value
-    ts590.query(AFvolume,0)
-
-    ChangeMode(config.RadioMode)                            # switch radio to default mode
-    sleep(0.1)
-    ChangeVFO(config.RadioVFO)                              # put radio to default VFO
-    if config.Radiocmd1:                                    # if the cmd1 is set in configuration file
-        ts590.query(config.Radiocmd1,0)                     # send to radio, 0 means no echo from radio needed
-    if config.Radiocmd2:
-        ts590.query(config.Radiocmd2,0)
-    if config.Radiocmd3:
-        ts590.query(config.Radiocmd3,0)
+    SubscribeLeds()                                         # from now on the LEDs follow the radio state
+    StartupRadio()                                          # radio ON, RF gain at MAX, AF volume, mode, VFO, cmd1-cmd3
+    State.update(power=True)                                # REC LED ON
 
     # inits for a little animation
     animation = "|/-\\"                                     # like a turning wheel
     anicount = 0                                            # init animation counter position
 
-    if config.RadioSniff == 1:                                  # polling the radio by sending IF regularely IF command
-        polling_daemon = Thread(target=pollRadio, args=(
-        config.polltime,), daemon=True, name='Poll Radio')      # create a thread for the radio polling
-        polling_daemon.start()                                  # start the thread
-        stop_thread = False                                     # flag to stop the thread by calling it with join()
+    StartPolling()                                              # poll or sniff the radio, as set by radiosniff
 
-    if config.RadioSniff == 2:                                  # sniff the COM data flow and extract infos
-        sniffer_daemon = Thread(target=SniffRadio, args=(
-        config.polltime,), daemon=True, name='Sniff Radio')     # create a thread for the radio sniffing
-        sniffer_daemon.start()                                  # start the thread
-        stop_thread = False                                     # flag to stop the thread by calling it with join()
+    ts590.start_writer(config.RadioMaxLag / 1000)               # pots and jogs writer, never more than maxlag late
+
+    if config.RadioReconnect == 1:                              # watch the COM port and reconnect if lost
+        supervisor_daemon = Thread(target=SuperviseRadio, args=(
+        0.5,), daemon=True, name='Supervise Radio')             # create a thread for the supervisor
+        supervisor_daemon.start()
+
+    if config.MidiReconnect == 1:                               # watch the MIDI controller and open it again if lost
+        midi_daemon = Thread(target=SuperviseMidi, args=(
+        0.5,), daemon=True, name='Supervise MIDI')              # create a thread for the supervisor
+        midi_daemon.start()
+
+    if config.IniReload == 1:                                   # watch the ini file and use its changes at once
+        reload_daemon = Thread(target=WatchIniFile, args=(
+        1,), daemon=True, name='Watch ini file')                # create a thread for the ini watcher
+        reload_daemon.start()
+
+    if config.Metrics == 1:                                     # runtime metrics endpoint
+        metrics.gauge('write_queue_depth',lambda: len(ts590.waiting) + len(ts590.pending))
+        metrics.gauge('reconnects',lambda: ts590.reconnects)
+        metrics.gauge('meter_sm',lambda: State.smeter)
+        metrics.gauge('cat_peak_rate',lambda: ts590.peak)
+        metrics.gauge('cat_theoretical_rate',lambda: ts590.pacing_report()['theoretical'])
+        try:
+            metrics.serve(config.MetricsPort)
+            print("Metrics on http://127.0.0.1:%d/metrics" % config.MetricsPort)
+        except OSError as msg:
+            print("Metrics not available :",msg)
+
+    if config.Rigctld == 1:                                     # rigctld server for the logging software
+        try:
+            Rig = RigServer(ts590,State,config.RigctldPort,config.RigctldRefresh / 1000)
+            Rig.start()
+            print("rigctld server on 127.0.0.1:%d" % config.RigctldPort)
+        except OSError as msg:
+            Rig = None
+            print("rigctld server not available :",msg)
+
+    if config.Meter == 1:                                       # meter bar graph on the LEDs
+        meter_daemon = Thread(target=MeterRadio,
+        daemon=True, name='Meter Radio')                        # create a thread for the meter
+        meter_daemon.start()
 
     print("\nFor a 'clean' stop of this software, use CTRL-C.")
 
@@ -884,19 +1673,52 @@ else:
             #print(config.runningMode)                              # this is mode set on radio
             #print(config.RadioMode)                         # this is mode set by sw
 
-            if Midi_In.poll():                                      # check if something is present on the MIDI input device
-                DJ_scan()                                           # if yes check what it is
-                print(animation[anicount],end='\r')                 # show activity with a small animation at each midi device poll
-                anicount = (anicount + 1)%4                         # next animation position, reset the number at 4 to avoid overflow
+            if NewConfig:                                           # ini file reloaded, used between two MIDI events
+                settings, NewConfig = NewConfig, None
+                ApplyIniFile(settings)
+            with MidiLock:                                          # not while SuperviseMidi opens the controller again
+                if not MidiLost and DJ_poll():                      # check if something is present on the MIDI input device
+                    DJ_scan()                                       # if yes check what it is
+                    print(animation[anicount],end='\r')             # show activity with a small animation at each midi device poll
+                    anicount = (anicount + 1)%4                     # next animation position, reset the number at 4 to avoid overflow
             sleep(0.00001)                                     # some delay in needed to not have CPU consumption !
         except KeyboardInterrupt:                                   # if we press CTRL-C to interrupt the program
-            if config.RadioSniff == 1:
-                stop_thread = True                                      # set the flag to kill the thread
-                polling_daemon.join()                                           # join the thread to stop it
-            if config.RadioSniff == 2:
+            if PollThread:
                 stop_thread = True                                      # set the flag to kill the thread
-                sniffer_daemon.join()                                           # join the thread to stop it
+                PollThread.join()                                               # join the thread to stop it
+            if config.IniReload == 1:
+                stop_thread = True
+                reload_daemon.join()
+            if config.RadioReconnect == 1:
+                stop_thread = True
+                supervisor_daemon.join()
+            if config.MidiReconnect == 1:
+                stop_thread = True
+                midi_daemon.join()
+            if config.Meter == 1:
+                stop_thread = True
+                meter_daemon.join()
+            if Rig:
+                Rig.stop()
+            Track.stop()
+            Lines.release()                                         # not left on air
+            ts590.stop_writer()
+            if config.RadioPacing == 1:
+                report = ts590.pacing_report()
+                print("\nCAT throughput : %d commands/s at most, %.0f possible, %d writes paced" %
+                      (report['peak'],report['theoretical'],report['paced']))
+            if config.Session == 1:
+                SaveSession()                                       # settings for the next start
             ts590.close_port()                                      # close radio port
+            Leds.stop_engine()
+            if config.MidiIngest == 1 and not MidiLost:
+                Midi_In.close()                                     # stops the ingest process
+            if Rec:
+                Rec.close()
+            if Status:
+                Status.close()
+            if Prof:
+                Prof.stop()                                         # writes the stacks
             pygame.midi.quit()
             print('All threads killed, exiting in 2s')
             sleep(2)